@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import atexit
+import undetected_chromedriver as uc
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+import config
+import run_limits
+
+
+def make_options(download_folder=None, headless=False):
+    opts = uc.ChromeOptions()
+    user_agent = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    )
+    opts.add_argument(f"--user-agent={user_agent}")
+    opts.add_argument("--lang=en-US,en")
+    opts.add_argument("--start-maximized")
+    opts.add_argument("--disable-blink-features=AutomationControlled")
+    opts.add_argument("--disable-infobars")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--use-fake-ui-for-media-stream")
+    opts.add_argument("--allow-file-access-from-files")
+    opts.add_argument("--autoplay-policy=no-user-gesture-required")
+    opts.add_argument("--enable-experimental-web-platform-features")
+    opts.add_argument("--disable-background-timer-throttling")
+    opts.add_argument("--disable-backgrounding-occluded-windows")
+    opts.add_argument("--disable-renderer-backgrounding")
+    # opts.add_argument("--headless=new")
+    prefs = {
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+        "profile.default_content_setting_values.automatic_downloads": 1,
+        "profile.managed_default_content_settings.images": 2,  # disable images
+    }
+    if download_folder:
+        prefs["download.default_directory"] = download_folder
+    opts.add_experimental_option("prefs", prefs)
+    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return opts
+
+
+# Resolved once per process; see resolve_chromedriver().
+_CHROMEDRIVER_PATH = None
+
+
+def resolve_chromedriver():
+    """
+    Path of the chromedriver binary, resolved at most once per process.
+    CHROMEDRIVER_PATH (offline mode) is used as-is. Otherwise the path that
+    webdriver_manager installed for CHROMEDRIVER_VERSION is remembered in
+    CHROMEDRIVER_CACHE, so later runs skip the version lookup entirely.
+    Without a pinned version the cached path is reused for a day.
+    """
+    global _CHROMEDRIVER_PATH
+    if _CHROMEDRIVER_PATH:
+        return _CHROMEDRIVER_PATH
+
+    if config.CHROMEDRIVER_PATH:
+        if not os.path.exists(config.CHROMEDRIVER_PATH):
+            raise FileNotFoundError(f"❌ CHROMEDRIVER_PATH not found: {config.CHROMEDRIVER_PATH}")
+        _CHROMEDRIVER_PATH = config.CHROMEDRIVER_PATH
+        return _CHROMEDRIVER_PATH
+
+    version = config.CHROMEDRIVER_VERSION or "latest"
+    cache = {}
+    if os.path.exists(config.CHROMEDRIVER_CACHE):
+        try:
+            with open(config.CHROMEDRIVER_CACHE, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    cached = cache.get(version)
+    if cached and os.path.exists(cached["path"]) and (
+            config.CHROMEDRIVER_VERSION or time.time() - cached["resolved_at"] < 24 * 3600):
+        _CHROMEDRIVER_PATH = cached["path"]
+        return _CHROMEDRIVER_PATH
+
+    print(f"🧭 Resolving chromedriver ({version})...")
+    _CHROMEDRIVER_PATH = ChromeDriverManager(driver_version=config.CHROMEDRIVER_VERSION).install()
+    cache[version] = {"path": _CHROMEDRIVER_PATH, "resolved_at": time.time()}
+    try:
+        with open(config.CHROMEDRIVER_CACHE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"⚠️ Could not cache chromedriver path: {e}")
+    return _CHROMEDRIVER_PATH
+
+
+class BrowserPool:
+    """
+    Keeps one warm Chrome for the whole process and hands it to the SRID /
+    layer discovery and to the downloader. The browser is restarted after
+    max_uses sessions or when it stopped responding, and quit at exit.
+    """
+
+    def __init__(self, max_uses=25):
+        self.max_uses = max_uses
+        self.driver = None
+        self.uses = 0
+        atexit.register(self.close)
+
+    def start(self):
+        print("🧭 Starting Chrome...")
+        driver_path = resolve_chromedriver()
+        run_limits.acquire_browser()
+        try:
+            # undetected_chromedriver downloads its own driver unless given a path
+            self.driver = uc.Chrome(options=make_options(), service=Service(driver_path),
+                                    driver_executable_path=driver_path)
+        except Exception:
+            run_limits.release_browser()
+            raise
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.uses = 0
+
+    def is_alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, download_folder=None):
+        """
+        Returns the warm driver, (re)starting Chrome first if needed. With a
+        download_folder, browser downloads are redirected there over CDP.
+        """
+        if self.driver is not None and self.uses >= self.max_uses:
+            self.recycle(f"reached {self.max_uses} uses")
+        elif self.driver is not None and not self.is_alive():
+            self.recycle("not responding")
+        if self.driver is None:
+            self.start()
+
+        self.uses += 1
+        try:
+            self.driver.get_log("performance")  # drop network events of the previous session
+        except Exception:
+            pass
+        if download_folder:
+            self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": download_folder,
+            })
+        return self.driver
+
+    def recycle(self, reason):
+        print(f"♻️ Restarting Chrome ({reason}).")
+        self.close()
+
+    def close(self):
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"⚠️ Error while closing Chrome: {e}")
+        run_limits.release_browser()
+        self.driver = None
+        self.uses = 0
+
+
+BROWSER_POOL = BrowserPool(config.BROWSER_MAX_USES)
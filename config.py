@@ -9,9 +9,69 @@ DB_CONFIG = {
 }
 
 # ===== Project / Beacon Config ===== #
+# Static defaults only: main passes each county / layer to the stages as a
+# RunContext / LayerContext. These values are used when a stage module is run by hand.
 BEACON_URL = "https://beacon.schneidercorp.com/Application.aspx?AppID=578"
 COUNTY_NAME = "Tippecanoe County IN"
 TABLE_NAME = COUNTY_NAME.lower().replace(" ", "_")  # cass_county_il
 FOLDER_NAME = COUNTY_NAME.lower().replace(" ", "_")  # cass_county_il
 layer_id = 42828
 layer_name = 'zoning__udo_update'
+
+# ===== Scheduler ===== #
+COUNTY_WORKERS = 1  # counties processed in parallel, each in its own process
+MAX_BROWSERS = None  # Chrome instances running at once across workers; None = one per worker
+MAX_DB_CONNECTIONS = 2  # workers loading / exporting the database at the same time
+GLOBAL_MAX_RPS = None  # GetVectorLayer requests per second across all workers (HTTP mode); None for no ceiling
+
+# ===== Loader ===== #
+INSERT_WORKERS = 1  # >1 parses JSON files in that many processes feeding one DB writer
+DEDUP_ON_LOAD = True  # unique geom_hash column: duplicate geometries are skipped at insert time
+
+# ===== Downloader ===== #
+BEACON_API_URL = "https://beacon.schneidercorp.com/api/beaconCore/GetVectorLayer"
+DOWNLOAD_MODE = "http"  # "http": POST from Python with the browser's token/cookies; "browser": injected JS downloads
+# AIMD window: starts at DOWNLOAD_START_PARALLEL, grows while responses are healthy,
+# halves on HTTP 429/5xx, timeouts or responses slower than DOWNLOAD_LATENCY_TARGET seconds.
+DOWNLOAD_START_PARALLEL = 5
+DOWNLOAD_MIN_PARALLEL = 1
+DOWNLOAD_MAX_PARALLEL = 20
+DOWNLOAD_MAX_RPS = 10  # requests-per-second ceiling; None for no ceiling
+DOWNLOAD_LATENCY_TARGET = 5.0
+PREPASS_FACTOR = 4  # HTTP mode: query 4x4-cell parents first and skip cells under empty ones (1 = off)
+SUBDIVIDE_MAX_DEPTH = 4  # quadtree levels for extents that hit the featureLimit (HTTP mode)
+# Failed extents are retried in the same run after DOWNLOAD_RETRY_BACKOFF * 2^(attempts - 1) seconds;
+# after DOWNLOAD_MAX_ATTEMPTS they are dead-lettered and reported at the end of the layer.
+DOWNLOAD_MAX_ATTEMPTS = 5
+DOWNLOAD_RETRY_BACKOFF = 2.0
+DOWNLOAD_REQUEUE_DEAD_LETTERS = True  # give dead-lettered extents a fresh set of attempts on each new run
+QPS_TOKEN_LOG = "qps_token_lifetimes.jsonl"  # observed QPS token lifetimes, one JSON line per expiry
+
+# ===== Browser ===== #
+BROWSER_MAX_USES = 25  # sessions (discovery / layer downloads) before the shared Chrome is restarted
+CHROMEDRIVER_VERSION = None  # pin a chromedriver version, e.g. "120.0.6099.109"; None = latest
+CHROMEDRIVER_PATH = None  # offline mode: local chromedriver binary, skips webdriver_manager entirely
+CHROMEDRIVER_CACHE = "chromedriver_cache.json"  # resolved driver paths, per pinned version
+
+# ===== Grid ===== #
+GRID_TARGET_CELLS = 3000
+# Optional county outlines (GeoJSON, or a shapefile via fiona) to drop grid cells outside the county.
+# Features are matched on COUNTY_BOUNDARY_NAME_FIELD == COUNTY_NAME (case-insensitive).
+COUNTY_BOUNDARY_FILE = None
+COUNTY_BOUNDARY_NAME_FIELD = "name"
+SAVE_GRID_TABLE = False  # also write the grid to a PostGIS table named TABLE_NAME
+GRID_MAX_FEATURES_PER_CELL = None  # set together with GRID_EXPECTED_FEATURES to size cells by feature density
+GRID_EXPECTED_FEATURES = None
+
+# ===== GeoJSON Export ===== #
+# "stream": rows through a server-side cursor, features serialized in Python.
+# "copy": PostGIS renders each feature and COPY streams the text to the file (always compact).
+GEOJSON_EXPORT_MODE = "stream"
+GEOJSON_COMPACT = False  # True: no indentation / whitespace (files 2-3x smaller)
+GEOJSON_ITERSIZE = 2000  # rows fetched per round trip by the server-side export cursor
+GEOJSON_MAX_DECIMAL_DIGITS = 6  # ST_AsGeoJSON precision; 6 digits of a degree is ~0.1 m (PostGIS default: 9)
+GEOJSON_DEDUP_PASS = True  # run remove_duplicate on the exported file; redundant with DEDUP_ON_LOAD
+GEOJSON_DEDUP_PRECISION = None  # round coordinates to this many decimals before hashing for dedup; None = exact
+# Degrees, e.g. 0.000005 (~0.5 m). Applies ST_SimplifyPreserveTopology per geometry: each stays
+# valid, but edges shared with neighbouring polygons are not kept in sync and may gap or overlap.
+GEOJSON_SIMPLIFY_TOLERANCE = None
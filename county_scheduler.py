@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import run_limits
+
+
+# ========================================
+#  Worker
+# ========================================
+def init_worker(browser_slots, db_slots, next_request, max_rps, browser_per_county):
+    """Installs the run-wide limits in a worker process."""
+    run_limits.install(browser_slots, db_slots, next_request, max_rps)
+    global BROWSER_PER_COUNTY
+    BROWSER_PER_COUNTY = browser_per_county
+
+
+# Fewer browsers than workers: hand the Chrome slot back after each county.
+BROWSER_PER_COUNTY = False
+
+
+def run_county(beacon_url, county_name):
+    """Processes one county and returns its run report entry; never raises."""
+    from main import process_county
+    from browser_pool import BROWSER_POOL
+
+    started = time.time()
+    report = {
+        "county_name": county_name,
+        "beacon_url": beacon_url,
+        "status": "ok",
+        "message": "",
+        "layers": [],
+    }
+    try:
+        report.update(process_county(beacon_url, county_name))
+    except Exception as e:
+        report["status"] = "error"
+        report["message"] = f"{type(e).__name__}: {str(e)}"
+        print(f"❌ Error processing {county_name}: {report['message']}")
+        traceback.print_exc()
+    finally:
+        if BROWSER_PER_COUNTY:
+            BROWSER_POOL.close()
+    report["elapsed_seconds"] = round(time.time() - started, 1)
+    return report
+
+
+# ========================================
+#  Scheduler
+# ========================================
+def run_counties(counties, workers, max_browsers=None, max_db_connections=None, max_rps=None):
+    """
+    Runs (beacon_url, county_name) pairs in `workers` processes. Chrome
+    instances, concurrent DB stages and the outbound request rate are
+    capped across all workers. Yields one report per county as it finishes.
+    """
+    from browser_pool import resolve_chromedriver
+
+    try:
+        resolve_chromedriver()  # once here, so workers read the cached path
+    except Exception as e:
+        print(f"⚠️ Could not resolve chromedriver up front: {e}")
+
+    context = multiprocessing.get_context("spawn")
+    max_browsers = max_browsers or workers
+    browser_slots = context.Semaphore(max_browsers)
+    db_slots = context.Semaphore(max_db_connections) if max_db_connections else None
+    next_request = context.Value("d", 0.0)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(browser_slots, db_slots, next_request, max_rps, max_browsers < workers),
+    ) as executor:
+        futures = {
+            executor.submit(run_county, beacon_url, county_name): county_name
+            for beacon_url, county_name in counties
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                report = future.result()
+            except Exception as e:  # worker process died
+                report = {"county_name": futures[future], "status": "error",
+                          "message": f"{type(e).__name__}: {str(e)}", "layers": []}
+            print(f"📋 {done}/{len(futures)} counties finished ({report['county_name']}: {report['status']}).")
+            yield report
+
+
+def write_run_report(reports, started_at):
+    """Writes run_report_<timestamp>.json and prints a per-county summary."""
+    path = os.path.join(os.getcwd(), f"run_report_{time.strftime('%Y%m%d_%H%M%S', time.localtime(started_at))}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "started_at": started_at,
+            "elapsed_seconds": round(time.time() - started_at, 1),
+            "counties": reports,
+        }, f, indent=2)
+
+    print("\n📋 ====== Run Report ======")
+    for report in reports:
+        missing = sum(layer.get("missing") or 0 for layer in report.get("layers", []))
+        print(f"   {'✅' if report['status'] == 'ok' else '❌'} {report['county_name']}: "
+              f"{len(report.get('layers', []))} layers, {missing} missing extents, "
+              f"{report.get('elapsed_seconds', 0)}s {report.get('message', '')}")
+    print(f"📋 Report written to {path}")
+    return path
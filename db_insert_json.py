@@ -1,11 +1,12 @@
 import os
+import io
 import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import psycopg2
 from config import DB_CONFIG
 import config
-import importlib
-from bs4 import BeautifulSoup
-import re  # Import re module here
+from tip_html import parse_tip_html, tip_html_cache_stats, reset_tip_html_cache
 
 # ========================================
 #  Database Connection
@@ -25,6 +26,10 @@ def connect_to_db():
 #  Table & Column Management
 # ========================================
 def add_column_to_table(conn, column_name,FINAL_TABLE_NAME):
+    """
+    Adds a TEXT column unless it exists. Returns True if the column is in the
+    table afterwards; a failed ALTER is rolled back so the connection stays usable.
+    """
     try:
         with conn.cursor() as cur:
             # Check if the column already exists
@@ -34,7 +39,7 @@ def add_column_to_table(conn, column_name,FINAL_TABLE_NAME):
                 WHERE table_name = '{FINAL_TABLE_NAME}' AND column_name = %s;
             """, (column_name,))
             if cur.fetchone():
-                return
+                return True
 
             # Add the new column
             cur.execute(f"""
@@ -43,234 +48,290 @@ def add_column_to_table(conn, column_name,FINAL_TABLE_NAME):
             """)
             conn.commit()
             print(f"    ✅ Column '{column_name}' added to table '{FINAL_TABLE_NAME}'.")
+            return True
     except Exception as e:
+        conn.rollback()
         print(f"❌ Error adding column '{column_name}': {e}")
+        return False
+
+
+def table_columns(conn, FINAL_TABLE_NAME):
+    """Names of the columns FINAL_TABLE_NAME really has."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s;",
+                    (FINAL_TABLE_NAME,))
+        return {row[0] for row in cur.fetchall()}
 
 
-def create_table(conn,FINAL_TABLE_NAME):
+# Makes geometries unique at load time: a generated hash of the WKB with an
+# (unnamed) unique constraint, so the inserts' ON CONFLICT DO NOTHING skips the
+# copies that neighbouring grid extents return for the same polygon.
+# Stored generated columns need PostgreSQL 12+.
+GEOM_HASH_COLUMN = "geom_hash TEXT GENERATED ALWAYS AS (md5(ST_AsBinary(geom))) STORED UNIQUE"
+
+
+def try_create_table(conn, FINAL_TABLE_NAME, columns=(), dedup=False):
+    """One CREATE TABLE attempt; rolls back and returns False if it fails."""
+    column_defs = "".join(f",\n                    {column} TEXT" for column in columns)
+    if dedup:
+        column_defs += f",\n                    {GEOM_HASH_COLUMN}"
     try:
         with conn.cursor() as cur:
-            cur.execute(f"DROP TABLE IF EXISTS {FINAL_TABLE_NAME} CASCADE;")
-            conn.commit()
-            print(f"    ⚠️ Existing table '{FINAL_TABLE_NAME}' dropped.")
             cur.execute(f"""
                 CREATE TABLE IF NOT EXISTS {FINAL_TABLE_NAME}(
                     id SERIAL PRIMARY KEY,
-                    geom GEOMETRY(MULTIPOLYGON, 4326)
+                    geom GEOMETRY(MULTIPOLYGON, 4326){column_defs}
                 );
             """)
-            conn.commit()
-            print(f"    ✅ Table '{FINAL_TABLE_NAME}' created or already exists.")
+        conn.commit()
+        return True
     except Exception as e:
-        print(f"❌ Error creating table: {e}")
+        conn.rollback()
+        print(f"❌ Error creating table '{FINAL_TABLE_NAME}': {e}")
+        return False
 
-def sanitize_key(key):
+
+def create_table(conn,FINAL_TABLE_NAME, columns=(), dedup=False):
     """
-    Function to sanitize column names to comply with SQL naming conventions.
-    - Replace invalid characters with underscores.
-    - Prefix column names that start with numbers with 'col_'.
+    Drops and recreates FINAL_TABLE_NAME with every inferred column up front.
+    With dedup, duplicate geometries are rejected by a unique geom_hash; if
+    the server cannot add it, the table is created without it.
     """
-    key = re.sub(r'\W+', '_', key)  # Replace non-alphanumeric characters with underscores
-    if key[0].isdigit():  # If the key starts with a digit, prefix it with 'col_'
-        key = f"col_{key}"
-    return key.lower()
+    columns = [column for column in columns if column not in ("id", "geom", "geom_hash")]
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {FINAL_TABLE_NAME} CASCADE;")
+        conn.commit()
+        print(f"    ⚠️ Existing table '{FINAL_TABLE_NAME}' dropped.")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error dropping table '{FINAL_TABLE_NAME}': {e}")
+
+    if try_create_table(conn, FINAL_TABLE_NAME, columns, dedup):
+        print(f"    ✅ Table '{FINAL_TABLE_NAME}' created with {len(columns)} data columns.")
+        return
+
+    # One bad column name should not cost the whole table: add them one by one.
+    created = dedup and try_create_table(conn, FINAL_TABLE_NAME, dedup=True)
+    if dedup and not created:
+        print(f"    ⚠️ Could not add the unique geom_hash column (needs PostgreSQL 12+); "
+              f"duplicate geometries will not be skipped at load time.")
+    if not created and not try_create_table(conn, FINAL_TABLE_NAME):
+        return
+    print(f"    ✅ Table '{FINAL_TABLE_NAME}' created or already exists.")
+    for column_name in columns:
+        add_column_to_table(conn, column_name,FINAL_TABLE_NAME)
+
 # ========================================
 #  Data Insertion
 # ========================================
-def process_json_file(file_path, conn, srid, insert_counter,FINAL_TABLE_NAME):
+def extract_dynamic_columns(item):
+    """Builds the {column: value} mapping for one GetVectorLayer feature."""
+    tip_html = item.get("TipHtml", "")
+    result_data = item.get("ResultData", [])
+
+    # ============================
+    # Extract dynamic fields
+    # ============================
+    dynamic_columns = {}
+
+    # Case 1: from ResultData array
+    if result_data:
+        for field in result_data:
+            key = field.get("Key", "").strip().replace(" ", "_").lower()
+            value = field.get("Value")
+            dynamic_columns[key] = value
+
+    # Case 2: from TipHtml (fallback)
+    elif tip_html:
+        dynamic_columns = parse_tip_html(tip_html)
+
+    return dynamic_columns
+
+
+def parse_json_file(file_path):
+    """
+    Parses one downloaded JSON file into plain (geom, dynamic_columns) rows.
+    Touches no database, so it can run in a worker process.
+    Returns (file_path, rows, error, tip_html_cache_stats).
+    """
+    rows = []
+    error = None
     try:
         with open(file_path, "r", encoding="utf-8") as file:
             data = json.load(file)
-            for item in data.get("d", []):
-                geom = item.get("WktGeometry")
-                tip_html = item.get("TipHtml", "")
-                result_data = item.get("ResultData", [])
-
-                # ============================
-                # Extract dynamic fields
-                # ============================
-                dynamic_columns = {}
-
-                # Case 1: from ResultData array
-                if result_data:
-                    for field in result_data:
-                        key = field.get("Key", "").strip().replace(" ", "_").lower()
-                        value = field.get("Value")
-                        dynamic_columns[key] = value
-
-                # Case 2: from TipHtml (fallback)
-                elif tip_html:
-                    from bs4 import BeautifulSoup
-                    import html
-
-                    # ======================
-                    # 🆕 NEW CASES (before main logic)
-                    # ======================
-                    if (
-                            'Zoning:' in tip_html
-                            and '<b>' in tip_html
-                            and '<a href' in tip_html
-                    ):
-                        # Example:
-                        # <div>Zoning: <b>I-1</b></div>
-                        # <div><a href="https://...">View I-1 Ordinance</a></div>
-                        soup = BeautifulSoup(tip_html, "html.parser")
-                        zoning_div = soup.find("div")
-                        link_div = zoning_div.find_next_sibling("div") if zoning_div else None
-
-                        # Extract zoning value
-                        if zoning_div and zoning_div.find("b"):
-                            zoning_value = zoning_div.find("b").get_text(strip=True)
-                            if zoning_value:
-                                dynamic_columns["zoning"] = zoning_value
-
-                        # Extract ordinance link
-                        if link_div and link_div.find("a") and link_div.find("a").get("href"):
-                            dynamic_columns["ordinance_link"] = link_div.find("a")["href"].strip()
-
-                    elif (
-                            tip_html.strip().startswith("<div>")
-                            and "</div>" in tip_html
-                            and " " not in BeautifulSoup(tip_html, "html.parser").get_text(strip=True)
-                            and ":" not in tip_html
-                            and "<b>" not in tip_html
-                            and "<a" not in tip_html
-                    ):
-                        # Example: <div>C1</div>
-                        soup = BeautifulSoup(tip_html, "html.parser")
-                        value = soup.get_text(strip=True)
-                        if value:
-                            dynamic_columns["tip_value"] = value
-
-                    elif  "<" in tip_html and ">" in tip_html:
-                        soup = BeautifulSoup(tip_html, "html.parser")
-                        divs = soup.find_all("div")
-
-                        # ======================
-                        # Case 1: Handle <div> blocks
-                        # ======================
-                        if divs:
-                            for div in divs:
-                                # Loop through all <b> tags inside the div
-                                b_tags = div.find_all("b")
-                                if b_tags:
-                                    for b_tag in b_tags:
-                                        key = sanitize_key(
-                                            b_tag.get_text(strip=True).replace(":", "").replace(" ", "_"))
-
-                                        # Extract everything after this <b> until the next <b> or <br>
-                                        value_parts = []
-                                        for sibling in b_tag.next_siblings:
-                                            if getattr(sibling, "name", None) == "b":  # stop if next <b> starts
-                                                break
-                                            if getattr(sibling, "name", None) == "br":
-                                                continue
-                                            text = str(sibling).strip()
-                                            if text:
-                                                value_parts.append(html.unescape(text))
-                                        value = " ".join(value_parts).replace("\xa0", "").strip()
-                                        if value:
-                                            dynamic_columns[key] = value
-                                    continue
-
-                                # Case 2: "Label: Value" (plain text inside div)
-                                text = div.get_text(" ", strip=True)
-                                separator = ":" if ":" in text else "=" if "=" in text else None
-                                if separator:
-                                    parts = text.split(separator, 1)
-                                    key = sanitize_key(parts[0].strip().replace(" ", "_"))
-                                    value = parts[1].strip()
-
-                                    # Extract link if present
-                                    a_tag = div.find("a")
-                                    if a_tag and a_tag.get("href"):
-                                        value = a_tag["href"].strip()
-
-                                    if value:
-                                        dynamic_columns[key] = value
-
-                                plain_text = div.get_text(strip=True)
-                                if plain_text:
-                                    dynamic_columns["tip_value"] = plain_text
-
-                        # ======================
-                        # Case 3: Standalone <b> tags outside <div>
-                        # ======================
-                        elif soup.find("b"):
-                            for b_tag in soup.find_all("b"):
-                                key = sanitize_key(b_tag.get_text(strip=True).replace(":", "").replace(" ", "_"))
-                                value = b_tag.next_sibling
-                                if value:
-                                    value = html.unescape(str(value)).strip().replace("\xa0", "").replace("\n", "")
-                                    if value:
-                                        dynamic_columns[key] = value
-
-                        # ======================
-                        # Case 4: Plain text with <br> separators (no <div> or <b>)
-                        # ======================
-                        else:
-                            text_parts = []
-                            for elem in soup.stripped_strings:
-                                text_parts.append(elem)
-
-                            for line in text_parts:
-                                # Look for key-value pairs separated by ':' or '='
-                                separator = "=" if "=" in line else ":" if ":" in line else None
-                                if not separator:
-                                    continue
-
-                                parts = line.split(separator, 1)
-                                key = sanitize_key(parts[0].strip().replace(" ", "_"))
-                                value = parts[1].strip()
-
-                                # Handle links (like "View: <a href=...>")
-                                a_tag = soup.find("a")
-                                if a_tag and key.startswith("view") and a_tag.get("href"):
-                                    value = a_tag["href"].strip()
-
-                                if value:
-                                    dynamic_columns[key] = value
-
-                    else:
-                        # ======================
-                        # Fallback for plain text TipHtml
-                        # ======================
-                        for line in tip_html.splitlines():
-                            if "=" in line:
-                                key, value = line.split("=", 1)
-                                key = sanitize_key(key.strip().replace(" ", "_"))
-                                value = value.strip()
-                                dynamic_columns[key] = value
-
-                # ============================
-                # Skip if no geometry
-                # ============================
-                if not geom:
-                    print(f"⚠️ Skipping feature without geometry in {file_path}")
-                    continue
-
-                # ============================
-                # Ensure table has columns
-                # ============================
-                for column_name in dynamic_columns.keys():
-                    add_column_to_table(conn, column_name,FINAL_TABLE_NAME)
-
-                # ============================
-                # Try inserting
-                # ============================
-                success = insert_into_db(conn, geom, srid, dynamic_columns,FINAL_TABLE_NAME)
-                if success:
-                    insert_counter[0] += 1
+
+        for item in data.get("d", []):
+            geom = item.get("WktGeometry")
+            dynamic_columns = extract_dynamic_columns(item)
+
+            # ============================
+            # Skip if no geometry
+            # ============================
+            if not geom:
+                print(f"⚠️ Skipping feature without geometry in {file_path}")
+                continue
+
+            rows.append((geom, dynamic_columns))
 
     except json.JSONDecodeError as e:
-        print(f"❌ JSON decode error in {file_path}: {e}")
-        conn.rollback()
+        error = f"JSON decode error in {file_path}: {e}"
+    except Exception as e:
+        error = f"Error processing {file_path}: {e}"
+
+    return file_path, rows, error, (os.getpid(),) + tip_html_cache_stats()
+
+
+def infer_file_columns(file_path):
+    """Schema pass for one file: the column names its features need."""
+    file_path, rows, error, cache_stats = parse_json_file(file_path)
+    columns = list(dict.fromkeys(key for _, dynamic_columns in rows for key in dynamic_columns))
+    return file_path, columns, error, cache_stats
+
+
+def iter_parsed_files(parse_func, json_files, workers):
+    """
+    Yields parse_func(file_path) for every file. With more than one worker the
+    parsing runs in a process pool, keeping at most 2 * workers files in flight
+    so a slow DB writer holds back the parsers instead of growing memory.
+    """
+    if workers <= 1:
+        for file_path in json_files:
+            yield parse_func(file_path)
+        return
+
+    files = iter(json_files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(parse_func, file_path) for file_path in itertools.islice(files, workers * 2)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.add(pool.submit(parse_func, next_file))
+                yield future.result()
+
+
+def infer_table_columns(json_files, workers=1, cache_stats=None):
+    """
+    Schema pass: streams every downloaded JSON file and returns the ordered
+    union of the column names its features will need.
+    """
+    columns = {}
+    for file_path, file_columns, error, stats in iter_parsed_files(infer_file_columns, json_files, workers):
+        if error:
+            # The load pass reports the same file again; keep inferring.
+            print(f"⚠️ Skipping during schema inference: {error}")
+        columns.update(dict.fromkeys(file_columns))
+        if cache_stats is not None:
+            cache_stats[stats[0]] = stats[1:]
+    return list(columns)
+
+
+def load_rows_into_db(conn, file_path, rows, srid, insert_counter,FINAL_TABLE_NAME, known_columns):
+    """Single DB writer: loads one parsed file and commits it."""
+    try:
+        # ============================
+        # Columns the schema pass missed
+        # ============================
+        for column_name in dict.fromkeys(key for _, columns in rows for key in columns):
+            if column_name not in known_columns and add_column_to_table(conn, column_name,FINAL_TABLE_NAME):
+                known_columns.add(column_name)
+
+        # ============================
+        # Bulk load, one commit per file
+        # ============================
+        insert_counter[0] += bulk_insert_into_db(conn, rows, srid, FINAL_TABLE_NAME, file_path)
+        conn.commit()
+
     except Exception as e:
         print(f"❌ Error processing {file_path}: {e}")
         conn.rollback()
 
 
+def copy_escape(value):
+    """Formats one value for the text format of COPY ... FROM STDIN."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def bulk_insert_into_db(conn, rows, srid, FINAL_TABLE_NAME, source="batch"):
+    """
+    Loads (geom, dynamic_columns) rows with a single COPY into a temp staging
+    table and moves them into FINAL_TABLE_NAME with one INSERT ... SELECT.
+    Rows whose geometry is already in the table are skipped (ON CONFLICT;
+    only enforced when the table has the unique geom_hash). If the batch
+    fails, it is retried row by row so each bad record is reported on its
+    own. Returns the number of inserted rows; the caller commits.
+    """
+    if not rows:
+        return 0
+
+    columns = list(dict.fromkeys(key for _, dynamic_columns in rows for key in dynamic_columns))
+    stage_columns = ", ".join(["geom_wkt"] + columns)
+
+    buffer = io.StringIO()
+    for geom, dynamic_columns in rows:
+        values = [geom] + [dynamic_columns.get(column) for column in columns]
+        buffer.write("\t".join(copy_escape(value) for value in values))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT bulk_load;")
+            cur.execute("DROP TABLE IF EXISTS beacon_stage;")
+            cur.execute(f"""
+                CREATE TEMP TABLE beacon_stage (
+                    {", ".join(f"{column} TEXT" for column in ["geom_wkt"] + columns)}
+                ) ON COMMIT DROP;
+            """)
+            cur.copy_expert(f"COPY beacon_stage ({stage_columns}) FROM STDIN;", buffer)
+
+            target_columns = ", ".join(["geom"] + columns)
+            select_columns = ", ".join(
+                [f"ST_Transform(ST_GeomFromText(geom_wkt, {srid}), 4326)"] + columns
+            )
+            cur.execute(f"""
+                INSERT INTO {FINAL_TABLE_NAME} ({target_columns})
+                SELECT {select_columns}
+                FROM beacon_stage
+                ON CONFLICT DO NOTHING;
+            """)
+            inserted = cur.rowcount
+            cur.execute("RELEASE SAVEPOINT bulk_load;")
+        return inserted
+
+    except psycopg2.Error as e:
+        with conn.cursor() as cur:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_load;")
+        print(f"⚠️ Bulk load failed for {source}, retrying row by row: "
+              f"{e.pgerror.strip() if e.pgerror else e}")
+
+    inserted = 0
+    for index, (geom, dynamic_columns) in enumerate(rows, start=1):
+        result = insert_into_db(conn, geom, srid, dynamic_columns,FINAL_TABLE_NAME)
+        if result is None:
+            print(f"    ❌ Record {index} of {source} was not inserted.")
+        else:
+            inserted += result
+    return inserted
+
+
 def insert_into_db(conn, geom, srid, dynamic_columns,FINAL_TABLE_NAME):
+    """
+    Inserts a single feature inside its own SAVEPOINT; the caller commits.
+    Returns 1 if inserted, 0 if its geometry was a duplicate, None on error.
+    """
     try:
         column_names = ", ".join(dynamic_columns.keys())
         placeholders = ", ".join(["%s"] * len(dynamic_columns))
@@ -286,53 +347,97 @@ def insert_into_db(conn, geom, srid, dynamic_columns,FINAL_TABLE_NAME):
         values = [geom] + values
 
         with conn.cursor() as cur:
+            cur.execute("SAVEPOINT row_insert;")
             cur.execute(f"""
                 INSERT INTO {FINAL_TABLE_NAME} ({column_names})
-                VALUES ({placeholders});
+                VALUES ({placeholders})
+                ON CONFLICT DO NOTHING;
             """, values)
-        conn.commit()
-        return True
+            inserted = cur.rowcount
+            cur.execute("RELEASE SAVEPOINT row_insert;")
+        return inserted
 
     except psycopg2.Error as e:
-        conn.rollback()  # ✅ Important fix
+        with conn.cursor() as cur:
+            cur.execute("ROLLBACK TO SAVEPOINT row_insert;")  # keep the rest of the batch
         print(f"❌ Database error inserting geometry: {e.pgerror.strip() if e.pgerror else e}")
-        return False
+        return None
     except Exception as e:
-        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("ROLLBACK TO SAVEPOINT row_insert;")
         print(f"❌ Unexpected error inserting data: {e}")
-        return False
+        return None
 
 
 # ========================================
 #  Main Function
 # ========================================
-def db_insert(srid):
-    importlib.reload(config)  # reload config to get updated values
-    layer_name = config.layer_name
-    FOLDER_NAME = config.FOLDER_NAME
-    TABLE_NAME =config.TABLE_NAME
-    safe_layer_name = layer_name.replace(" ", "_").lower()
-    FINAL_TABLE_NAME = f"{TABLE_NAME}_{safe_layer_name}"
-    JSON_FOLDER = os.path.join(os.getcwd(), FOLDER_NAME, layer_name, "json")
+def db_insert(layer, workers=None):
+    """
+    Loads every downloaded JSON file of the layer (a LayerContext) into its
+    table, in the county's SRID. With workers > 1 (default:
+    config.INSERT_WORKERS) JSON decoding and TipHtml parsing run in a
+    process pool feeding this single DB writer.
+    """
+    workers = workers or config.INSERT_WORKERS
+    srid = layer.run.srid
+    FINAL_TABLE_NAME = layer.table_name
+    JSON_FOLDER = layer.json_folder
 
     conn = connect_to_db()
     if not conn:
         return
 
-    create_table(conn,FINAL_TABLE_NAME)
+    json_files = [
+        os.path.join(JSON_FOLDER, filename)
+        for filename in os.listdir(JSON_FOLDER)
+        if filename.endswith(".json")
+    ]
+
+    reset_tip_html_cache()
+    cache_stats = {}  # pid -> (hits, misses), cumulative per process
+    if workers > 1:
+        print(f"    ⚙️ Parsing with {workers} worker processes.")
+
+    # Phase 1: infer the schema, create the table once
+    columns = infer_table_columns(json_files, workers, cache_stats)
+    create_table(conn,FINAL_TABLE_NAME, columns, config.DEDUP_ON_LOAD)
+    known_columns = table_columns(conn, FINAL_TABLE_NAME)  # a bad column name may not have made it
     insert_counter = [0]  # Use list for mutability
-
-    # Process all JSON files
-    for filename in os.listdir(JSON_FOLDER):
-        if filename.endswith(".json"):
-            file_path = os.path.join(JSON_FOLDER, filename)
-            process_json_file(file_path, conn, srid, insert_counter,FINAL_TABLE_NAME)
+    feature_count = 0
+
+    # Phase 2: parse in parallel, load through this connection only
+    load_stats = {}
+    for file_path, rows, error, stats in iter_parsed_files(parse_json_file, json_files, workers):
+        load_stats[stats[0]] = stats[1:]
+        if error:
+            print(f"❌ {error}")
+            continue
+        feature_count += len(rows)
+        load_rows_into_db(conn, file_path, rows, srid, insert_counter,FINAL_TABLE_NAME, known_columns)
 
     conn.close()
     print(f"    ✅ Total records inserted: {insert_counter[0]}")
+    if config.DEDUP_ON_LOAD and feature_count > insert_counter[0]:
+        print(f"    🧹 Skipped {feature_count - insert_counter[0]} of {feature_count} features "
+              f"(duplicate geometries or failed rows).")
+
+    # Counters are cumulative per process: each pool pass starts fresh workers,
+    # but the sequential path runs both passes here, so the load pass's own
+    # lookups are its totals minus the schema pass's.
+    schema = [sum(stats[i] for stats in cache_stats.values()) for i in (0, 1)]
+    load = [sum(stats[i] for stats in load_stats.values()) for i in (0, 1)]
+    if workers <= 1:
+        load = [total - before for total, before in zip(load, schema)]
+    for name, (hits, misses) in (("schema pass", schema), ("load pass", load)):
+        if hits + misses:
+            print(f"    🧠 TipHtml cache, {name}: {hits} hits, {misses} misses "
+                  f"({hits / (hits + misses):.1%} hit rate)")
 
 
 # Uncomment to run directly
 # if __name__ == "__main__":
-#     srid = 4326
-#     db_insert(srid)
+#     from run_context import default_layer_context
+#     layer = default_layer_context()
+#     layer.run.srid = 4326
+#     db_insert(layer)
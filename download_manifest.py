@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import time
+from extent_downloader import extent_filename
+
+
+# Extents in these states need no further download.
+FINISHED_STATUSES = ("done", "empty")
+
+# Rows of an older finishnet.json that the current grid no longer has.
+STALE_STATUS = "stale"
+
+
+def extent_id(extent):
+    return extent_filename(extent)[:-len(".json")]
+
+
+class DownloadManifest:
+    """
+    Durable per-layer record of every finishnet extent, stored in SQLite
+    next to the layer's json folder. Each row is keyed by the extent id
+    (its file name without .json). It holds the status (pending, done,
+    empty, failed, stale), attempts, byte size, feature count and last update
+    time. Missing extents are an indexed query instead of a directory scan,
+    and an interrupted run resumes with just the unfinished extents.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        is_new = not os.path.exists(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extents (
+                extent_id TEXT PRIMARY KEY,
+                minx, miny, maxx, maxy,  -- untyped: values round-trip exactly, so file names match
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER,
+                features INTEGER,
+                error TEXT,
+                updated_at REAL
+            );
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS extents_status ON extents (status);")
+        self.conn.commit()
+        self.is_new = is_new
+
+    def add_extents(self, extents):
+        """
+        Matches the manifest against the current grid: new extents are
+        registered as pending and rows that already exist are left alone.
+        Rows the grid no longer has are marked stale, so cells of an older
+        finishnet.json are never downloaded, retried or counted; a stale
+        row that is back in the grid starts over as pending.
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO extents (extent_id, minx, miny, maxx, maxy, updated_at) VALUES (?, ?, ?, ?, ?, ?);",
+            [(extent_id(e), e["minx"], e["miny"], e["maxx"], e["maxy"], now) for e in extents],
+        )
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS grid (extent_id TEXT PRIMARY KEY);")
+        self.conn.execute("DELETE FROM grid;")
+        self.conn.executemany("INSERT OR IGNORE INTO grid VALUES (?);", [(extent_id(e),) for e in extents])
+        self.conn.execute("""
+            UPDATE extents SET status = ?, updated_at = ?
+            WHERE status != ? AND extent_id NOT IN (SELECT extent_id FROM grid);
+        """, (STALE_STATUS, now, STALE_STATUS))
+        self.conn.execute("""
+            UPDATE extents SET status = 'pending', attempts = 0, error = NULL, updated_at = ?
+            WHERE status = ? AND extent_id IN (SELECT extent_id FROM grid);
+        """, (now, STALE_STATUS))
+        self.conn.commit()
+
+    def reconcile_files(self, download_folder):
+        """One-time import for layers downloaded before the manifest existed."""
+        existing = {name[:-len(".json")] for name in os.listdir(download_folder) if name.endswith(".json")}
+        pending = [row[0] for row in self.conn.execute("SELECT extent_id FROM extents WHERE status = 'pending';")]
+        done = [(os.path.getsize(os.path.join(download_folder, f"{i}.json")), time.time(), i)
+                for i in pending if i in existing]
+        self.conn.executemany(
+            "UPDATE extents SET status = 'done', bytes = ?, updated_at = ? WHERE extent_id = ?;", done,
+        )
+        self.conn.commit()
+        return len(done)
+
+    def record(self, results):
+        """
+        Stores download results. Quadrants of a subdivided extent are folded
+        into their root extent, which only counts as done if all of them are.
+        """
+        by_root = {}
+        for r in results:
+            by_root.setdefault(extent_id(r.get("root", r["extent"])), []).append(r)
+
+        rows = []
+        now = time.time()
+        for root_id, root_results in by_root.items():
+            ok = all(r["ok"] for r in root_results)
+            errors = [r["error"] for r in root_results if r["error"]]
+            rows.append((
+                "done" if ok else "failed",
+                sum(r["bytes"] for r in root_results),
+                sum(r.get("features", 0) for r in root_results if r.get("depth", 0) == 0) if ok else None,
+                errors[0] if errors else None,
+                now,
+                root_id,
+            ))
+        self.conn.executemany("""
+            UPDATE extents
+            SET status = ?, attempts = attempts + 1, bytes = ?, features = ?, error = ?, updated_at = ?
+            WHERE extent_id = ?;
+        """, rows)
+        self.conn.commit()
+
+    def mark_empty(self, extents):
+        """Extents known to have no features (coarse pre-pass); no file is written."""
+        self.conn.executemany(
+            "UPDATE extents SET status = 'empty', bytes = 0, features = 0, updated_at = ? WHERE extent_id = ?;",
+            [(time.time(), extent_id(e)) for e in extents],
+        )
+        self.conn.commit()
+
+    def pending(self, max_attempts=None):
+        """Extents that still need downloading, in grid order, leaving out dead letters and stale rows."""
+        skipped = (*FINISHED_STATUSES, STALE_STATUS)
+        rows = self.conn.execute(f"""
+            SELECT minx, miny, maxx, maxy FROM extents
+            WHERE status NOT IN ({", ".join("?" * len(skipped))})
+            AND (? IS NULL OR attempts < ?)
+            ORDER BY rowid;
+        """, (*skipped, max_attempts, max_attempts))
+        return [{"minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy} for minx, miny, maxx, maxy in rows]
+
+    def retry_schedule(self, max_attempts, backoff):
+        """
+        Failed extents whose backoff (backoff * 2^(attempts - 1) seconds since
+        the last attempt) has run out. Returns (due extents, seconds until the
+        next one is due); both are empty / None once nothing is left to retry.
+        """
+        rows = self.conn.execute("""
+            SELECT minx, miny, maxx, maxy, attempts, updated_at FROM extents
+            WHERE status = 'failed' AND attempts < ?
+            ORDER BY rowid;
+        """, (max_attempts,))
+
+        now = time.time()
+        due = []
+        wait = None
+        for minx, miny, maxx, maxy, attempts, updated_at in rows:
+            ready_in = updated_at + backoff * 2 ** (attempts - 1) - now
+            if ready_in <= 0:
+                due.append({"minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy})
+            else:
+                wait = ready_in if wait is None else min(wait, ready_in)
+        return due, (None if due else wait)
+
+    def dead_letters(self, max_attempts):
+        """Extents that failed max_attempts times: [(extent_id, attempts, last error)]."""
+        return self.conn.execute("""
+            SELECT extent_id, attempts, error FROM extents
+            WHERE status = 'failed' AND attempts >= ?
+            ORDER BY rowid;
+        """, (max_attempts,)).fetchall()
+
+    def requeue_dead_letters(self, max_attempts):
+        """Resets the attempts of dead-lettered extents so a new run retries them; returns how many."""
+        cur = self.conn.execute(
+            "UPDATE extents SET attempts = 0, updated_at = ? WHERE status = 'failed' AND attempts >= ?;",
+            (time.time(), max_attempts),
+        )
+        self.conn.commit()
+        return cur.rowcount
+
+    def counts(self):
+        """Rows per status for the current grid (stale rows left out)."""
+        return dict(self.conn.execute(
+            "SELECT status, COUNT(*) FROM extents WHERE status != ? GROUP BY status;", (STALE_STATUS,),
+        ))
+
+    def close(self):
+        self.conn.close()
+
+
+def open_manifest(layer):
+    """The manifest of one layer (a LayerContext): <county>/<layer>/manifest.sqlite."""
+    os.makedirs(layer.folder, exist_ok=True)
+    return DownloadManifest(layer.manifest_path)
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import asyncio
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import run_limits
+
+
+# ========================================
+#  Helpers
+# ========================================
+def extent_filename(extent):
+    """File name a downloaded extent is saved under (also used by verify_record)."""
+    return f"{extent['minx']}_{extent['maxx']}_{extent['miny']}_{extent['maxy']}.json"
+
+
+def make_session(cookies, user_agent, referer, max_parallel=5):
+    """
+    requests.Session that looks like the browser tab the QPS token came from:
+    same cookies (driver.get_cookies() format), same user agent, pooled
+    keep-alive connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_parallel)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    session.headers.update({
+        "User-Agent": user_agent,
+        "Content-Type": "application/json",
+        "Accept": "text/plain, */*; q=0.01",
+        "Referer": referer,
+        "X-Requested-With": "XMLHttpRequest",
+    })
+    return session
+
+
+# ========================================
+#  Download
+# ========================================
+def split_extent(extent):
+    """Quadtree split: the four quadrants of an extent."""
+    midx = (extent["minx"] + extent["maxx"]) / 2
+    midy = (extent["miny"] + extent["maxy"]) / 2
+    return [
+        {"minx": extent["minx"], "miny": extent["miny"], "maxx": midx, "maxy": midy},
+        {"minx": midx, "miny": extent["miny"], "maxx": extent["maxx"], "maxy": midy},
+        {"minx": extent["minx"], "miny": midy, "maxx": midx, "maxy": extent["maxy"]},
+        {"minx": midx, "miny": midy, "maxx": extent["maxx"], "maxy": extent["maxy"]},
+    ]
+
+
+def fetch_extent(session, api_url, qps_token, extent, request_template, download_folder, timeout=60,
+                 skip_empty=False):
+    """
+    POSTs one GetVectorLayer request and writes the response bytes as-is.
+    The file is written under a temp name and renamed, so a half-written
+    file is never mistaken for a finished download. With skip_empty, a
+    response without features is not written at all; without a
+    download_folder only the features are counted.
+    """
+    result = {"extent": extent, "ok": False, "status": None, "bytes": 0, "features": 0, "error": None}
+    run_limits.throttle_request()
+    started = time.perf_counter()
+    try:
+        response = session.post(
+            api_url,
+            params={"QPS": qps_token},
+            json={**request_template, "ext": extent},
+            timeout=timeout,
+        )
+        result["status"] = response.status_code
+        if not response.ok:
+            raise ValueError(f"HTTP {response.status_code}")
+
+        content = response.content
+        try:
+            result["features"] = len(json.loads(content).get("d") or [])
+        except (ValueError, AttributeError):
+            raise ValueError("response is not JSON")
+
+        result["ok"] = True
+        result["bytes"] = len(content)
+        if download_folder is None or (skip_empty and not result["features"]):
+            result["elapsed"] = time.perf_counter() - started
+            return result
+
+        file_path = os.path.join(download_folder, extent_filename(extent))
+        with open(file_path + ".part", "wb") as f:
+            f.write(content)
+        os.replace(file_path + ".part", file_path)
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = str(e)
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+class AdaptiveWindow:
+    """
+    AIMD concurrency window. Every healthy response grows the window by
+    1/size (about +1 per round trip); a 429, 5xx or timeout halves it, at
+    most once per cooldown so one burst of errors does not collapse it.
+    """
+
+    def __init__(self, start, minimum, maximum, latency_target, cooldown=2.0):
+        self.size = float(start)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.last_decrease = 0.0
+
+    @property
+    def limit(self):
+        return max(self.minimum, min(self.maximum, int(self.size)))
+
+    def record(self, result):
+        status = result["status"]
+        congested = status is None or status == 429 or status >= 500
+        if congested or result["elapsed"] > self.latency_target:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.cooldown:
+                self.size = max(self.minimum, self.size / 2)
+                self.last_decrease = now
+        elif result["ok"]:
+            self.size = min(self.maximum, self.size + 1 / self.size)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def download_extents_async(session, api_url, qps_token, extents, request_template, download_folder,
+                                 max_parallel=20, min_parallel=1, start_parallel=5, max_rps=None,
+                                 latency_target=5.0, log_every=5.0, max_depth=0, warn_truncated=True):
+    """
+    Schedules extent downloads under an AIMD window and an optional
+    requests-per-second ceiling. The blocking POSTs run on a thread pool
+    sized to max_parallel; asyncio only decides when the next one starts.
+
+    An extent whose response hits request_template["featureLimit"] was
+    truncated: it is split into four quadrants and each is queried again,
+    down to max_depth levels. Quadrants that come back empty are skipped
+    instead of being written to disk. warn_truncated=False silences the
+    warning for extents still truncated at max_depth (count-only passes).
+    """
+    feature_limit = request_template.get("featureLimit")
+    loop = asyncio.get_running_loop()
+    window = AdaptiveWindow(start_parallel, min_parallel, max_parallel, latency_target)
+    pending = deque((extent, 0, extent) for extent in extents)  # (extent, quadtree depth, root extent)
+    in_flight = {}
+    results = []
+    latencies = deque(maxlen=500)
+    min_interval = 1.0 / max_rps if max_rps else 0.0
+    next_start = started = last_log = time.monotonic()
+    subdivided = 0
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while pending or in_flight:
+            while pending and len(in_flight) < window.limit:
+                now = time.monotonic()
+                if next_start > now:
+                    await asyncio.sleep(next_start - now)
+                next_start = max(now, next_start) + min_interval
+                extent, depth, root = pending.popleft()
+                task = loop.run_in_executor(
+                    executor, fetch_extent, session, api_url, qps_token, extent, request_template, download_folder,
+                    60, depth > 0,
+                )
+                in_flight[task] = (depth, root)
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                depth, root = in_flight.pop(task)
+                result = task.result()
+                result["depth"] = depth
+                result["root"] = root
+                results.append(result)
+                latencies.append(result["elapsed"])
+                window.record(result)
+
+                if result["ok"] and feature_limit and result["features"] >= feature_limit:
+                    if depth < max_depth:
+                        pending.extend((child, depth + 1, root) for child in split_extent(result["extent"]))
+                        subdivided += 1
+                    elif warn_truncated:
+                        print(f"⚠️ Extent {extent_filename(result['extent'])} still hits the "
+                              f"{feature_limit}-feature limit at depth {depth}.")
+
+            now = time.monotonic()
+            if now - last_log >= log_every or not (pending or in_flight):
+                print(f"📈 {len(results)}/{len(results) + len(pending) + len(in_flight)} extents | "
+                      f"{len(results) / max(now - started, 1e-9):.1f} req/s | "
+                      f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms | "
+                      f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms | "
+                      f"window {window.limit} | "
+                      f"errors {sum(not r['ok'] for r in results)} | "
+                      f"subdivided {subdivided}")
+                last_log = now
+
+    return results
+
+
+def download_extents(session, api_url, qps_token, extents, request_template, download_folder, **window_options):
+    """Downloads extents over the pooled session; returns one result per extent."""
+    results = asyncio.run(download_extents_async(
+        session, api_url, qps_token, extents, request_template, download_folder, **window_options,
+    ))
+
+    failed = [r for r in results if not r["ok"]]
+    print(f"✅ Downloaded {len(results) - len(failed)}/{len(results)} extents "
+          f"({sum(r['bytes'] for r in results) / 1e6:.1f} MB)")
+    for r in failed[:10]:
+        print(f"❌ Error for extent {extent_filename(r['extent'])}: {r['error']}")
+    return results
+
+
+# ========================================
+#  Coarse Pre-pass
+# ========================================
+def coarse_parents(extents, factor):
+    """
+    Groups regular grid cells into parents of factor x factor cells.
+    Returns [(parent_extent, children)].
+    """
+    step_x = extents[0]["maxx"] - extents[0]["minx"]
+    step_y = extents[0]["maxy"] - extents[0]["miny"]
+    x0 = min(e["minx"] for e in extents)
+    y0 = min(e["miny"] for e in extents)
+
+    groups = {}
+    for extent in extents:
+        col = int(round((extent["minx"] - x0) / step_x)) // factor
+        row = int(round((extent["miny"] - y0) / step_y)) // factor
+        groups.setdefault((col, row), []).append(extent)
+
+    parents = []
+    for (col, row), children in groups.items():
+        parent = {
+            "minx": x0 + col * factor * step_x,
+            "miny": y0 + row * factor * step_y,
+            "maxx": x0 + (col + 1) * factor * step_x,
+            "maxy": y0 + (row + 1) * factor * step_y,
+        }
+        parents.append((parent, children))
+    return parents
+
+
+def skip_empty_extents(session, api_url, qps_token, extents, request_template,
+                       factor, cache_path, **window_options):
+    """
+    Hierarchical pre-pass: queries one coarse parent per factor x factor
+    cells and only keeps the cells whose parent returned features. Each
+    parent is asked for at most one feature; the counts (0 or 1) are kept
+    in cache_path (zero = negative cache), so re-runs skip known parents. Returns (extents still to download,
+    extents under empty parents); the caller records the latter as empty.
+    """
+    if not extents or factor <= 1:
+        return extents, []
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+
+    groups = coarse_parents(extents, factor)
+    unknown = [parent for parent, _ in groups if extent_filename(parent) not in cache]
+    if unknown:
+        # Only "any features?" matters here, so one feature per parent is enough.
+        print(f"🔭 Coarse pre-pass: querying {len(unknown)} parents of {factor}x{factor} cells...")
+        results = asyncio.run(download_extents_async(
+            session, api_url, qps_token, unknown, {**request_template, "featureLimit": 1}, None,
+            **{**window_options, "max_depth": 0, "warn_truncated": False},
+        ))
+        for r in results:
+            if r["ok"]:
+                cache[extent_filename(r["extent"])] = r["features"]
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+
+    keep = []
+    empty = []
+    for parent, children in groups:
+        if cache.get(extent_filename(parent)) == 0:
+            empty.extend(children)
+        else:
+            keep.extend(children)  # has features, or the parent request failed
+
+    print(f"🔭 Pre-pass skipped {len(empty)}/{len(extents)} cells under empty parents.")
+    return keep, empty
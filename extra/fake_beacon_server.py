@@ -0,0 +1,69 @@
+import sys
+import json
+import random
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# =========================
+# CONFIGURATION
+# =========================
+# Local stand-in for GetVectorLayer. Point config.BEACON_API_URL at
+# http://127.0.0.1:8765/api/beaconCore/GetVectorLayer to exercise the downloader.
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+VALID_QPS = None          # set to a token string to answer 401 for anything else
+ERROR_RATE = 0.05         # share of requests answered with 503
+THROTTLE_RATE = 0.02      # share of requests answered with 429
+LATENCY = (0.05, 0.4)     # seconds, uniform
+MAX_FEATURES = 40
+
+
+class GetVectorLayerHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/GetVectorLayer"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        qps = parse_qs(url.query).get("QPS", [""])[0]
+        time.sleep(random.uniform(*LATENCY))
+
+        if VALID_QPS and qps != VALID_QPS:
+            self.send_error(401)
+            return
+        roll = random.random()
+        if roll < THROTTLE_RATE:
+            self.send_error(429)
+            return
+        if roll < THROTTLE_RATE + ERROR_RATE:
+            self.send_error(503)
+            return
+
+        ext = request.get("ext", {})
+        limit = request.get("featureLimit", 1500)
+        features = []
+        for i in range(min(random.randint(0, MAX_FEATURES), limit)):
+            x = random.uniform(ext.get("minx", 0), ext.get("maxx", 1))
+            y = random.uniform(ext.get("miny", 0), ext.get("maxy", 1))
+            features.append({
+                "WktGeometry": f"POLYGON(({x} {y},{x + 10} {y},{x + 10} {y + 10},{x} {y + 10},{x} {y}))",
+                "TipHtml": f"<div>R{i % 4 + 1}</div>",
+                "ResultData": [],
+            })
+
+        body = json.dumps({"d": features}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    print(f"🧪 Fake GetVectorLayer listening on http://127.0.0.1:{PORT}/api/beaconCore/GetVectorLayer")
+    ThreadingHTTPServer(("127.0.0.1", PORT), GetVectorLayerHandler).serve_forever()
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+from geojson import stream_features, copy_features
+from run_context import RunContext
+
+# =========================
+# CONFIGURATION
+# =========================
+FEATURES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+KEEP_TABLE = False  # keep the synthetic table for repeated runs
+
+LAYER = RunContext("", "geojson benchmark", base_dir=tempfile.mkdtemp()).layer(0, "features")
+TABLE_NAME = LAYER.table_name
+
+
+def create_table(conn):
+    """Synthetic zoning-like layer: small polygons around Indiana with a few text columns."""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE_NAME};")
+        cur.execute(f"""
+            CREATE TABLE {TABLE_NAME} (
+                id SERIAL PRIMARY KEY,
+                geom geometry(Polygon, 4326),
+                zoning TEXT,
+                description TEXT,
+                ordinance TEXT,
+                acres TEXT
+            );
+        """)
+        cur.execute(f"""
+            INSERT INTO {TABLE_NAME} (geom, zoning, description, ordinance, acres)
+            SELECT
+                ST_Buffer(ST_SetSRID(ST_MakePoint(-87 + random(), 40 + random()), 4326), 0.0005, 4),
+                'R' || (i % 7),
+                'Residential district ' || (i % 7) || ' - single family',
+                'https://example.org/ordinance/' || (i % 50),
+                round((random() * 10)::numeric, 2)::text
+            FROM generate_series(1, %s) AS i;
+        """, (FEATURES,))
+    conn.commit()
+
+
+def export_legacy(conn, f):
+    """The original exporter: fetchall into dicts, one json.dump(indent=2) at the end."""
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(f"SELECT *, ST_AsGeoJSON(geom)::json AS geometry FROM {TABLE_NAME};")
+    features = []
+    for row in cur.fetchall():
+        geom = row.pop("geometry", None)
+        row.pop("geom", None)
+        row.pop("id", None)
+        if geom:
+            features.append({"type": "Feature", "geometry": geom, "properties": row})
+    json.dump({"type": "FeatureCollection", "features": features}, f, indent=2)
+    cur.close()
+    return len(features)
+
+
+def run(name, export):
+    path = os.path.join(LAYER.run.base_dir, f"{name}.geojson")
+    conn = psycopg2.connect(**DB_CONFIG)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as f:
+        count = export(conn, f)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.close()
+
+    with open(path, "r", encoding="utf-8") as f:
+        parsed = len(json.load(f)["features"])  # the output must be valid GeoJSON
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f"⏱️ {name:<16} {elapsed:7.2f}s | peak Python memory {peak / 1e6:8.1f} MB | "
+          f"{size / 1e6:8.1f} MB file | {count} features ({parsed} parsed)")
+
+
+conn = psycopg2.connect(**DB_CONFIG)
+print(f"📦 Creating {FEATURES} synthetic features in '{TABLE_NAME}'...")
+create_table(conn)
+
+run("legacy", export_legacy)
+run("stream", lambda c, f: stream_features(c, TABLE_NAME, f))
+run("stream compact", lambda c, f: stream_features(c, TABLE_NAME, f, compact=True))
+run("copy", lambda c, f: copy_features(c, TABLE_NAME, f))
+
+if not KEEP_TABLE:
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE_NAME};")
+    conn.commit()
+conn.close()
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tip_html import parse_tip_html, parse_tip_html_fast, parse_tip_html_with_soup, reset_tip_html_cache
+
+# =========================
+# CONFIGURATION
+# =========================
+# Folder(s) of downloaded GetVectorLayer responses, e.g. <county>/<layer>/json
+JSON_FOLDERS = sys.argv[1:] or [r"tippecanoe_county_in\zoning__udo_update\json"]
+ROUNDS = 3
+
+
+def load_corpus(folders):
+    """Collects every TipHtml string from features that have no ResultData."""
+    corpus = []
+    for folder in folders:
+        for filename in os.listdir(folder):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Skipping {filename}: {e}")
+                continue
+            for item in data.get("d", []):
+                tip_html = item.get("TipHtml")
+                if tip_html and not item.get("ResultData"):
+                    corpus.append(tip_html)
+    return corpus
+
+
+def parse_uncached(tip_html):
+    """Fast path with BeautifulSoup fallback, bypassing the LRU cache."""
+    dynamic_columns = parse_tip_html_fast(tip_html)
+    if dynamic_columns is None:
+        dynamic_columns = parse_tip_html_with_soup(tip_html)
+    return dynamic_columns
+
+
+def time_parser(parser, corpus):
+    """Best-of-ROUNDS wall time for parsing the whole corpus."""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for tip_html in corpus:
+            try:
+                parser(tip_html)
+            except Exception:
+                pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+corpus = load_corpus(JSON_FOLDERS)
+if not corpus:
+    print("❌ No TipHtml samples found.")
+    sys.exit(1)
+
+print(f"📦 {len(corpus)} TipHtml samples ({len(set(corpus))} distinct)")
+
+# Correctness: the fast path must agree with BeautifulSoup wherever it answers
+fast_hits = 0
+mismatches = 0
+for tip_html in corpus:
+    fast = parse_tip_html_fast(tip_html)
+    if fast is None:
+        continue
+    fast_hits += 1
+    try:
+        expected = parse_tip_html_with_soup(tip_html)
+    except Exception as e:
+        expected = f"{type(e).__name__}: {e}"
+    if fast != expected:
+        mismatches += 1
+        if mismatches <= 10:
+            print(f"❌ Mismatch for {tip_html!r}\n   fast={fast}\n   soup={expected}")
+
+print(f"✅ Fast path handled {fast_hits}/{len(corpus)} samples "
+      f"({fast_hits / len(corpus):.1%}), mismatches: {mismatches}")
+
+soup_time = time_parser(parse_tip_html_with_soup, corpus)
+combined_time = time_parser(parse_uncached, corpus)
+reset_tip_html_cache()
+cached_time = time_parser(parse_tip_html, corpus)
+print(f"⏱️ BeautifulSoup only  : {soup_time:.3f}s ({soup_time / len(corpus) * 1e6:.1f} µs/sample)")
+print(f"⏱️ Fast path + fallback: {combined_time:.3f}s ({combined_time / len(corpus) * 1e6:.1f} µs/sample)")
+print(f"⏱️ With LRU cache      : {cached_time:.3f}s ({cached_time / len(corpus) * 1e6:.1f} µs/sample)")
+print(f"🚀 Speed-up: {soup_time / combined_time:.1f}x uncached, {soup_time / cached_time:.1f}x cached")
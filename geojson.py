@@ -1,79 +1,194 @@
 import os
 import json
+import textwrap
+from datetime import datetime, timezone
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from config import DB_CONFIG
 import config
-import importlib
 
 
-def export_table_to_geojson():
+def feature_collection_header(metadata=None, compact=False):
+    """Opening text of a FeatureCollection, up to and including the "features" bracket."""
+    if compact:
+        header = '{"type":"FeatureCollection",'
+        if metadata is not None:
+            header += '"metadata":' + json.dumps(metadata, separators=(",", ":")) + ","
+        return header + '"features":['
+
+    header = '{\n  "type": "FeatureCollection",\n'
+    if metadata is not None:
+        header += '  "metadata": ' + json.dumps(metadata, indent=2).replace("\n", "\n  ") + ",\n"
+    return header + '  "features": ['
+
+
+def write_feature_collection(f, features, compact=False, metadata=None):
+    """
+    Streams features into a FeatureCollection as they come, one at a time.
+    The indented layout is byte-for-byte what json.dump(..., indent=2)
+    gives for the whole collection; compact drops all whitespace.
+    Returns the number of features written.
+    """
+    f.write(feature_collection_header(metadata, compact))
+
+    count = 0
+    for feature in features:
+        if compact:
+            f.write(("," if count else "") + json.dumps(feature, separators=(",", ":")))
+        else:
+            f.write(("," if count else "") + "\n" + textwrap.indent(json.dumps(feature, indent=2), "    "))
+        count += 1
+
+    if compact:
+        f.write("]}")
+    else:
+        f.write("\n  ]\n}" if count else "]\n}")
+    return count
+
+
+def export_geometry(simplify_tolerance=None):
+    """
+    SQL for the exported geometry, optionally simplified. Each geometry is
+    simplified on its own (it stays valid), so edges shared by neighbouring
+    polygons can drift apart into gaps or overlaps; keeping shared edges
+    needs ST_CoverageSimplify (PostGIS 3.4+) over the whole layer.
+    """
+    if simplify_tolerance:
+        return f"ST_SimplifyPreserveTopology(geom, {float(simplify_tolerance)})"
+    return "geom"
+
+
+def export_metadata(table_name, max_decimal_digits, simplify_tolerance):
+    """Top-level "metadata" member recording how the file was produced."""
+    return {
+        "source_table": table_name,
+        "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "max_decimal_digits": max_decimal_digits,
+        "simplify_tolerance": simplify_tolerance,
+    }
+
+
+def stream_features(conn, table_name, f, compact=False, itersize=2000,
+                    max_decimal_digits=9, simplify_tolerance=None, metadata=None):
     """
-    Exports a PostgreSQL table (with geom in SRID 4326)
-    to a GeoJSON FeatureCollection file.
+    "stream" mode: rows come from a server-side cursor, itersize at a
+    time, and each feature is written as soon as it is fetched, so memory
+    stays flat whatever the table size.
     """
-    importlib.reload(config)  # reload config to get updated values
-    layer_name = config.layer_name
-    TABLE_NAME = config.TABLE_NAME
-    FOLDER_NAME = config.FOLDER_NAME
+    cur = conn.cursor(name="geojson_export", cursor_factory=RealDictCursor)
+    cur.itersize = itersize
+    try:
+        cur.execute(f"""
+            SELECT *, ST_AsGeoJSON({export_geometry(simplify_tolerance)},
+                                   {int(max_decimal_digits)})::json AS geometry
+            FROM {table_name};
+        """)
+
+        def features():
+            for row in cur:
+                geom = row.pop("geometry", None)
+                row.pop("geom", None)
+                row.pop("id", None)
+                row.pop("geom_hash", None)
+
+                if geom:
+                    yield {
+                        "type": "Feature",
+                        "geometry": geom,
+                        "properties": row
+                    }
+
+        return write_feature_collection(f, features(), compact, metadata)
+    finally:
+        cur.close()
+
 
-    safe_layer_name = layer_name.replace(" ", "_").lower()
+def property_columns(conn, table_name):
+    """Columns exported as feature properties, in table order."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND column_name NOT IN ('id', 'geom', 'geom_hash')
+            ORDER BY ordinal_position;
+        """, (table_name,))
+        return [row[0] for row in cur.fetchall()]
 
-    # Final table name: TABLE_NAME + '_' + safe_layer_name
-    table_name = f"{TABLE_NAME}_{safe_layer_name}"
+
+def copy_features(conn, table_name, f, max_decimal_digits=9, simplify_tolerance=None, metadata=None):
+    """
+    "copy" mode: PostGIS renders every feature (ST_AsGeoJSON of the row)
+    and COPY streams the text straight into the file; no Python object is
+    built per row. Features are written one per line, always compact.
+
+    COPY's CSV format is used with delimiter and quote set to control
+    characters that never occur unescaped in JSON, so the feature text
+    comes out verbatim. The separating comma is prefixed server-side.
+    """
+    columns = "".join(f"{column}, " for column in property_columns(conn, table_name))
+    geometry = export_geometry(simplify_tolerance)
+    query = f"""
+        SELECT CASE WHEN row_number() OVER () > 1 THEN ',' ELSE '' END
+               || ST_AsGeoJSON(t.*, 'geom', {int(max_decimal_digits)})
+        FROM (SELECT {columns}{geometry} AS geom FROM {table_name} WHERE geom IS NOT NULL) AS t
+    """
+    f.write(feature_collection_header(metadata, compact=True) + "\n")
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')", f)
+        count = cur.rowcount
+    f.write("]}")
+    return count
+
+
+def export_table_to_geojson(layer, compact=None, itersize=None, mode=None,
+                            max_decimal_digits=None, simplify_tolerance=None):
+    """
+    Exports the layer's PostgreSQL table (with geom in SRID 4326)
+    to a GeoJSON FeatureCollection file, either streamed row by row
+    ("stream") or rendered by the database and COPYed out ("copy").
+    Coordinates are rounded to max_decimal_digits and, with a
+    simplify_tolerance (degrees), each geometry is simplified on its own
+    (see export_geometry); both settings are recorded in the file's
+    "metadata" member.
+    """
+    compact = config.GEOJSON_COMPACT if compact is None else compact
+    itersize = itersize or config.GEOJSON_ITERSIZE
+    mode = mode or config.GEOJSON_EXPORT_MODE
+    if max_decimal_digits is None:
+        max_decimal_digits = config.GEOJSON_MAX_DECIMAL_DIGITS
+    if simplify_tolerance is None:
+        simplify_tolerance = config.GEOJSON_SIMPLIFY_TOLERANCE
+    table_name = layer.table_name
+    metadata = export_metadata(table_name, max_decimal_digits, simplify_tolerance)
 
     # Output folder and file
-    output_folder = os.path.join(os.getcwd(), FOLDER_NAME, layer_name, "geojson")
-    os.makedirs(output_folder, exist_ok=True)
-    output_file = os.path.join(output_folder, f"{table_name}.geojson")
+    output_file = layer.geojson_path
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
     try:
         # Connect to database
         print(" 🔌 Connecting to database...")
         conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        # Fetch rows with geometry as GeoJSON
-        print(f"    📦 Fetching data from table '{table_name}'...")
-        query = f"""
-            SELECT *, ST_AsGeoJSON(geom)::json AS geometry
-            FROM {table_name};
-        """
-        cur.execute(query)
-        rows = cur.fetchall()
-
-        features = []
-        for row in rows:
-            geom = row.pop("geometry", None)
-            row.pop("geom", None)
-            row.pop("id", None)
-
-            if geom:
-                features.append({
-                    "type": "Feature",
-                    "geometry": geom,
-                    "properties": row
-                })
-
-        geojson = {
-            "type": "FeatureCollection",
-            "features": features
-        }
-
-        # Write GeoJSON file
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(geojson, f, indent=2)
-
-        print(f"    ✅ Exported {len(features)} features to '{output_file}'")
+        # Write GeoJSON file (under a temp name until complete)
+        print(f"    📦 Exporting data from table '{table_name}' ({mode} mode)...")
+        with open(output_file + ".part", "w", encoding="utf-8") as f:
+            if mode == "copy":
+                count = copy_features(conn, table_name, f, max_decimal_digits, simplify_tolerance, metadata)
+            else:
+                count = stream_features(conn, table_name, f, compact, itersize,
+                                        max_decimal_digits, simplify_tolerance, metadata)
+        os.replace(output_file + ".part", output_file)
+
+        print(f"    ✅ Exported {count} features to '{output_file}'")
 
     except Exception as e:
         print(f"    ❌ Error exporting GeoJSON: {e}")
 
     finally:
         if 'conn' in locals():
-            cur.close()
             conn.close()
 
 
 if __name__ == "__main__":
-    export_table_to_geojson()
+    from run_context import default_layer_context
+    export_table_to_geojson(default_layer_context())
@@ -0,0 +1,143 @@
+import json
+import math
+from pyproj import CRS, Transformer
+from shapely.geometry import box, shape
+from shapely.ops import transform as transform_geometry
+from shapely.strtree import STRtree
+
+
+# ========================================
+#  Projection
+# ========================================
+def crs_for_srid(srid):
+    """Beacon SRIDs are EPSG codes or, for some counties, ESRI codes (e.g. 102675)."""
+    for authority in ("EPSG", "ESRI"):
+        try:
+            return CRS.from_user_input(f"{authority}:{srid}")
+        except Exception:
+            continue
+    raise ValueError(f"Unknown SRID {srid}: not an EPSG or ESRI code.")
+
+
+def project_bbox(srid, south, north, west, east):
+    """
+    Projects a lat/lng bbox to `srid` the way ST_Transform(ST_MakeEnvelope(...))
+    does: transform the four corners and take their extent.
+    Returns (xmin, xmax, ymin, ymax).
+    """
+    transformer = Transformer.from_crs("EPSG:4326", crs_for_srid(srid), always_xy=True)
+    xs, ys = transformer.transform([west, east, east, west], [south, south, north, north])
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+# ========================================
+#  Cell Counts
+# ========================================
+def cells_per_axis(length, step):
+    """Values generate_series(min, min + length, step) yields: floor(length / step) + 1."""
+    return int(math.floor(length / step)) + 1
+
+
+def cell_count(width, height, step):
+    return cells_per_axis(width, step) * cells_per_axis(height, step)
+
+
+# ========================================
+#  Step Selection
+# ========================================
+def choose_step(width, height, target_cells=3000, min_step=500, max_step=4500, increment=100):
+    """
+    Grid step (from min_step to max_step in `increment`s) whose cell count is
+    closest to target_cells, ties going to the smaller step. The count only
+    falls as the step grows, so a binary search finds where it crosses the
+    target and only the two steps around the crossing need comparing.
+    """
+    steps = list(range(min_step, max_step + 1, increment))
+
+    def first_index(predicate):
+        """First index whose step satisfies a predicate that is monotone in step."""
+        lo, hi = 0, len(steps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if predicate(cell_count(width, height, steps[mid])):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    crossing = first_index(lambda count: count <= target_cells)
+    candidates = []
+    if crossing < len(steps):
+        candidates.append(steps[crossing])
+    if crossing > 0:
+        # Equal counts form plateaus; take the smallest step with the same count.
+        above = cell_count(width, height, steps[crossing - 1])
+        candidates.append(steps[first_index(lambda count: count <= above)])
+
+    return min(candidates, key=lambda step: (abs(cell_count(width, height, step) - target_cells), step))
+
+
+def step_for_max_features(width, height, expected_features, max_features_per_cell,
+                          min_step=500, max_step=4500, increment=100):
+    """
+    Largest step (rounded down to `increment`) that keeps the expected number
+    of features per cell under max_features_per_cell, assuming they are spread
+    evenly over the extent.
+    """
+    if not expected_features:
+        return max_step
+    step = math.sqrt(max_features_per_cell * width * height / expected_features)
+    step = int(step // increment) * increment
+    return max(min_step, min(max_step, step))
+
+
+# ========================================
+#  Extents
+# ========================================
+def generate_extents(xmin, ymin, xmax, ymax, step):
+    """finishnet.json-style extents for a regular grid, in generate_series order."""
+    extents = []
+    for i in range(cells_per_axis(xmax - xmin, step)):
+        x = xmin + i * step
+        for j in range(cells_per_axis(ymax - ymin, step)):
+            y = ymin + j * step
+            extents.append({"minx": x, "miny": y, "maxx": x + step, "maxy": y + step})
+    return extents
+
+
+# ========================================
+#  Boundary Clipping
+# ========================================
+def load_county_boundary(path, county_name, name_field="name"):
+    """
+    Reads the outline of `county_name` (EPSG:4326) from a GeoJSON file, or
+    from a shapefile / other OGR source through fiona. Features are matched
+    on `name_field`, case-insensitively. Returns None if the county is absent.
+    """
+    if path.lower().endswith((".geojson", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            features = json.load(f).get("features", [])
+    else:
+        import fiona  # only needed for non-GeoJSON boundary files
+        with fiona.open(path) as source:
+            features = [{"properties": dict(f["properties"]), "geometry": f["geometry"]} for f in source]
+
+    wanted = county_name.strip().lower()
+    for feature in features:
+        value = (feature.get("properties") or {}).get(name_field)
+        if value and str(value).strip().lower() == wanted and feature.get("geometry"):
+            return shape(feature["geometry"])
+    return None
+
+
+def clip_extents(extents, boundary, srid):
+    """
+    Keeps only the extents that intersect the county boundary (EPSG:4326).
+    The boundary is projected to `srid` and tested against an STRtree of
+    the grid cells, so only cells near the outline get an exact test.
+    """
+    transformer = Transformer.from_crs("EPSG:4326", crs_for_srid(srid), always_xy=True)
+    projected = transform_geometry(transformer.transform, boundary)
+    cells = [box(e["minx"], e["miny"], e["maxx"], e["maxy"]) for e in extents]
+    hits = STRtree(cells).query(projected, predicate="intersects")
+    return [extents[i] for i in sorted(hits)]
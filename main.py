@@ -1,29 +1,18 @@
 import csv
 import os
 import time
+import config
 from table_creater import get_bounding_box, create_table_and_grid, export_grid_to_json,extract_srid_and_layers
 from python_java import capture_qps_and_download
 from db_insert_json import db_insert
 from verify_record import update_missing_features
 from geojson import export_table_to_geojson
 from remove_duplicate_geojson import remove_duplicate
-import traceback
-
-
-def update_config(beacon_url, county_name):
-    """Update BEACON_URL and COUNTY_NAME in config.py"""
-    config_file_path = os.path.join(os.getcwd(), "config.py")
-    with open(config_file_path, "r+") as f:
-        lines = f.readlines()
-        for i, line in enumerate(lines):
-            if line.strip().startswith("BEACON_URL"):
-                lines[i] = f'BEACON_URL = "{beacon_url}"\n'
-            elif line.strip().startswith("COUNTY_NAME"):
-                lines[i] = f'COUNTY_NAME = "{county_name}"\n'
-        f.seek(0)
-        f.writelines(lines)
-        f.truncate()
-    print(f"✅ Updated config.py: BEACON_URL={beacon_url}, COUNTY_NAME='{county_name}'")
+from browser_pool import BROWSER_POOL
+from county_scheduler import run_county, run_counties, write_run_report
+from run_context import RunContext
+import run_limits
+
 
 def log_error_to_csv(csv_file, county_name, error_message):
     """Update error_message in the same CSV (no temp file)."""
@@ -69,6 +58,71 @@ def log_error_to_csv(csv_file, county_name, error_message):
 
 
 
+def process_county(beacon_url, county_name):
+    """Runs every step for one county; returns its status, message and per-layer results."""
+    print(f"\n🚀 ====== Processing County: {county_name} ======")
+    run = RunContext(beacon_url, county_name)
+
+    # === Step 1: Making Table ===
+    print("🚀  ====== Starting Making Table ======")
+    srid, zoning_layers= extract_srid_and_layers(run)
+
+    if not zoning_layers:
+        message = "No zoning layers found."
+        print(f"\t⚠️ {message}")
+        print(f"🎉 Completed county: {county_name}\n")
+        return {"status": "no_layers", "message": message, "layers": []}
+
+    south, north, west, east = get_bounding_box(run)
+    grid_extents = create_table_and_grid(run, south, north, west, east)
+    export_grid_to_json(run, grid_extents)
+
+    layers = []
+    for layer in zoning_layers:
+        layer_context = run.layer(layer["LayerId"], layer["LayerName"])
+        layer_name = layer_context.layer_name
+        layer_started = time.time()
+
+        print(f"\n🚀 ====== Processing Layer: {layer_name} (ID: {layer_context.layer_id}) ======")
+
+        # Step 4: Download JSON files for this layer
+        print("\n🚀 ====== Starting Downloading JSON Files ======")
+        capture_qps_and_download(layer_context)
+
+        # Step 5: Check for missing parcel files (retries and dead letters are handled by the downloader)
+        print("🚀 Checking for missing parcel files...")
+        missing_count = update_missing_features(layer_context)
+        if missing_count:
+            print(f"⚠️ {missing_count} extents could not be downloaded — continuing with the rest.")
+        else:
+            print("✅ No missing parcels found.")
+
+        with run_limits.db_slot():
+            # Step 6: Insert JSON data into DB
+            print("🚀 ====== INSERTING Data OF JSON Files IN DB ====== ")
+            db_insert(layer_context)
+
+            # Step 7: Export DB table to GeoJSON
+            print("🚀 ====== Making GeoJSON From DB ====== ")
+            export_table_to_geojson(layer_context)
+
+            # Step 8: Remove duplicate geometries (already unique when deduplicated on load)
+            if config.GEOJSON_DEDUP_PASS:
+                print("🚀 ====== Removing Duplicate geom ====== ")
+                remove_duplicate(layer_context)
+
+        print(f"✅ Finished processing layer: {layer_name}\n")
+        layers.append({
+            "layer_id": layer_context.layer_id,
+            "layer_name": layer_name,
+            "missing": missing_count,
+            "elapsed_seconds": round(time.time() - layer_started, 1),
+        })
+
+    print(f"🎉 Completed county: {county_name}\n")
+    return {"status": "ok", "message": "", "layers": layers}
+
+
 def main():
     csv_file = "county_urls.csv"  # change filename if needed
     if not os.path.exists(csv_file):
@@ -83,98 +137,27 @@ def main():
             print(f"❌ CSV must have 'website_url' and 'county_name' columns. Found: {reader.fieldnames}")
             return
 
-        for row in reader:
-            beacon_url = row[normalized_fieldnames["website_url"]].strip()
-            county_name = row[normalized_fieldnames["county_name"]].strip()
-
-            try:
-                print(f"\n🚀 ====== Processing County: {county_name} ======")
-                update_config(beacon_url, county_name)
-
-                # === Step 1: Making Table ===
-                print("🚀  ====== Starting Making Table ======")
-                srid, zoning_layers= extract_srid_and_layers()
-
-                if not zoning_layers:
-                    message = "No zoning layers found."
-                    print(f"\t⚠️ {message}")
-                    log_error_to_csv(csv_file, county_name, message)
-                    print(f"🎉 Completed county: {county_name}\n")
-                    continue
-
-                south, north, west, east = get_bounding_box()
-                create_table_and_grid(srid, south, north, west, east)
-
-                for layer in zoning_layers:
-                    layer_id = layer["LayerId"]
-                    layer_name = layer["LayerName"].replace(" ", "_").lower()
-
-                    print(f"\n🚀 ====== Processing Layer: {layer_name} (ID: {layer_id}) ======")
-
-                    # Update config.py for this layer
-                    config_file_path = os.path.join(os.getcwd(), "config.py")
-                    with open(config_file_path, "r+") as f:
-                        lines = f.readlines()
-                        for i, line in enumerate(lines):
-                            if line.strip().startswith("layer_id"):
-                                lines[i] = f"layer_id = {layer_id}\n"
-                            elif line.strip().startswith("layer_name"):
-                                lines[i] = f"layer_name = '{layer_name}'\n"
-                        f.seek(0)
-                        f.writelines(lines)
-                        f.truncate()
-                    print(f"    ✅ Updated config.py: layer_id={layer_id}, layer_name='{layer_name}'")
-
-                    export_grid_to_json()
-
-                    # Step 4: Download JSON files for this layer
-                    print("\n🚀 ====== Starting Downloading JSON Files ======")
-                    capture_qps_and_download()
-
-                    # Step 5: Check for missing parcel files
-                    print("🚀 Checking for missing parcel files...")
-                    attempt = 1
-                    while True:
-                        print(f"\n🔎 Attempt #{attempt}: Checking for missing files...")
-                        missing_count = update_missing_features()
-
-                        if missing_count > 0:
-                            print(f"🔁 Found {missing_count} missing files — retrying download...")
-                            capture_qps_and_download()
-                            attempt += 1
-                            time.sleep(3)
-                        else:
-                            print("✅ No missing parcels found. Skipping re-download.")
-                            break
-
-                    # Step 6: Insert JSON data into DB
-                    print("🚀 ====== INSERTING Data OF JSON Files IN DB ====== ")
-                    db_insert(srid)
-
-                    # Step 7: Export DB table to GeoJSON
-                    print("🚀 ====== Making GeoJSON From DB ====== ")
-                    export_table_to_geojson()
-
-                    # Step 8: Remove duplicate geometries
-                    print("🚀 ====== Removing Duplicate geom ====== ")
-                    remove_duplicate()
-
-                    print(f"✅ Finished processing layer: {layer_name}\n")
-
-                print(f"🎉 Completed county: {county_name}\n")
-
-            except Exception as e:
-                # Capture full traceback
-                error_message = f"{type(e).__name__}: {str(e)}"
-                print(f"❌ Error processing {county_name}: {error_message}")
-                traceback.print_exc()
-
-                # Log to CSV
-                log_error_to_csv(csv_file, county_name, error_message)
-
-                # Continue with next county
-                continue
-
+        counties = [
+            (row[normalized_fieldnames["website_url"]].strip(), row[normalized_fieldnames["county_name"]].strip())
+            for row in reader
+        ]
+
+    started_at = time.time()
+    if config.COUNTY_WORKERS > 1:
+        reports = run_counties(counties, config.COUNTY_WORKERS, config.MAX_BROWSERS,
+                               config.MAX_DB_CONNECTIONS, config.GLOBAL_MAX_RPS)
+    else:
+        reports = (run_county(beacon_url, county_name) for beacon_url, county_name in counties)
+
+    finished = []
+    for report in reports:
+        # Log to CSV (only this process writes it, also with parallel workers)
+        if report["message"]:
+            log_error_to_csv(csv_file, report["county_name"], report["message"])
+        finished.append(report)
+
+    BROWSER_POOL.close()
+    write_run_report(finished, started_at)
     print("🎉 All counties processed successfully (errors logged in CSV where applicable)!")
 
 
@@ -3,54 +3,19 @@ import json
 import time
 import re
 from urllib.parse import urlparse, parse_qs
-import importlib
-import undetected_chromedriver as uc
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 import config
+from browser_pool import BROWSER_POOL
+from download_manifest import open_manifest
+from extent_downloader import make_session, download_extents, extent_filename, skip_empty_extents
 
 # ================= CONFIG ================= #
 PATTERN = re.compile(r"/GetVectorLayer\?QPS=", re.IGNORECASE)
 
 
-def make_options(download_folder, headless=False):
-    opts = uc.ChromeOptions()
-    user_agent = (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-    opts.add_argument(f"--user-agent={user_agent}")
-    opts.add_argument("--lang=en-US,en")
-    opts.add_argument("--start-maximized")
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument("--disable-infobars")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--use-fake-ui-for-media-stream")
-    opts.add_argument("--allow-file-access-from-files")
-    opts.add_argument("--autoplay-policy=no-user-gesture-required")
-    opts.add_argument("--enable-experimental-web-platform-features")
-    opts.add_argument("--disable-background-timer-throttling")
-    opts.add_argument("--disable-backgrounding-occluded-windows")
-    opts.add_argument("--disable-renderer-backgrounding")
-    # opts.add_argument("--headless=new")
-    prefs = {
-        "download.default_directory": download_folder,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True,
-        "profile.default_content_setting_values.automatic_downloads": 1,
-        "profile.managed_default_content_settings.images": 2,  # disable images
-    }
-    opts.add_experimental_option("prefs", prefs)
-    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
-    return opts
-
-
 def parse_perf_entry(entry):
     try:
         return json.loads(entry["message"])["message"]
@@ -78,10 +43,9 @@ def get_qps_token(driver):
     return None
 
 
-def open_and_get_qps(driver, timeout=30):
+def open_and_get_qps(driver, beacon_url, timeout=30):
     """Open the URL, wait until fully loaded, optionally click 'Agree', and extract QPS token."""
-    importlib.reload(config)
-    URL = config.BEACON_URL
+    URL = beacon_url
     print(f"\n🌐 Opening: {URL}")
     driver.get(URL)
 
@@ -122,71 +86,185 @@ def open_and_get_qps(driver, timeout=30):
     return qps_token
 
 
-def download_batch(driver, qps_token, extents, batch_num, REQUEST_TEMPLATE):
-    """Inject JS to fetch and download JSON for multiple extents in parallel."""
+# HTTP statuses that mean the QPS token (or its session) is no longer accepted.
+AUTH_ERROR_STATUSES = (401, 403)
+
+
+class QpsTokenManager:
+    """
+    Caches the QPS token per AppID together with the cookies and user agent
+    it was issued to, and reuses it across batches and layers. The page is
+    only reloaded when the token is missing or has been invalidated after
+    an auth-style error. Every invalidation appends the token's observed
+    lifetime to config.QPS_TOKEN_LOG so the refresh policy can be tuned.
+    """
+
+    def __init__(self):
+        self.tokens = {}
+
+    @staticmethod
+    def app_id(beacon_url):
+        return parse_qs(urlparse(beacon_url).query).get("AppID", [beacon_url])[0]
+
+    def get(self, browser, beacon_url):
+        """
+        Returns the cached entry for the AppID of beacon_url, harvesting it if
+        needed. `browser` is a callable returning the driver, so Chrome is only
+        started when a token actually has to be harvested.
+        """
+        app_id = self.app_id(beacon_url)
+        entry = self.tokens.get(app_id)
+        if entry:
+            age = time.time() - entry["captured_at"]
+            print(f"♻️ Reusing QPS token for AppID {app_id} (age {age:.0f}s, {entry['requests']} requests).")
+            return entry
+
+        driver = browser()
+        qps_token = open_and_get_qps(driver, beacon_url)
+        if not qps_token:
+            return None
+        entry = {
+            "app_id": app_id,
+            "token": qps_token,
+            "captured_at": time.time(),
+            "cookies": driver.get_cookies(),
+            "user_agent": driver.execute_script("return navigator.userAgent;"),
+            "requests": 0,
+        }
+        self.tokens[app_id] = entry
+        return entry
+
+    def invalidate(self, entry, reason):
+        """Drops a token that stopped working and records how long it lived."""
+        if self.tokens.get(entry["app_id"]) is not entry:
+            return
+        del self.tokens[entry["app_id"]]
+        lifetime = time.time() - entry["captured_at"]
+        print(f"⌛ QPS token for AppID {entry['app_id']} expired after {lifetime:.0f}s "
+              f"and {entry['requests']} requests ({reason}).")
+        try:
+            with open(config.QPS_TOKEN_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "app_id": entry["app_id"],
+                    "captured_at": entry["captured_at"],
+                    "lifetime_seconds": round(lifetime, 1),
+                    "requests": entry["requests"],
+                    "reason": reason,
+                }) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not record token lifetime: {e}")
+
+
+TOKEN_MANAGER = QpsTokenManager()
+
+
+def download_window_options():
+    """AIMD window / rate settings for extent_downloader from config.py."""
+    return {
+        "max_parallel": config.DOWNLOAD_MAX_PARALLEL,
+        "min_parallel": config.DOWNLOAD_MIN_PARALLEL,
+        "start_parallel": config.DOWNLOAD_START_PARALLEL,
+        "max_rps": config.DOWNLOAD_MAX_RPS,
+        "latency_target": config.DOWNLOAD_LATENCY_TARGET,
+        "max_depth": config.SUBDIVIDE_MAX_DEPTH,
+    }
+
+
+def download_batch(driver, qps_token, extents, batch_num, REQUEST_TEMPLATE, max_parallel=5, timeout=900):
+    """
+    Inject JS to fetch and download JSON for multiple extents in parallel.
+    Runs as an async script: the browser calls back once every fetch has
+    settled, with one {extent, ok, status, error} result per extent. If the
+    batch outlasts the script timeout, every extent in it is reported as
+    failed so the manifest and the retry scheduler pick them up.
+    """
+    jobs = [{"index": i, "extent": extent, "fileName": extent_filename(extent)} for i, extent in enumerate(extents)]
     js_code = f"""
-    (async function() {{
-        const qpsToken = "{qps_token}";
-        const extents = {json.dumps(extents)};
-        const requestDataTemplate = {json.dumps(REQUEST_TEMPLATE)};
-        const apiUrl = `https://beacon.schneidercorp.com/api/beaconCore/GetVectorLayer?QPS=${{qpsToken}}`;
-        const delay = ms => new Promise(r => setTimeout(r, ms));
-        const MAX_PARALLEL = 5;
-        let active = 0;
-        let index = 0;
-        async function fetchExtent(extent) {{
-            const requestData = {{ ...requestDataTemplate, ext: extent }};
-            try {{
-                const response = await fetch(apiUrl, {{
-                    method: "POST",
-                    headers: {{
-                        "Content-Type": "application/json",
-                        "Accept": "text/plain, */*; q=0.01"
-                    }},
-                    body: JSON.stringify(requestData)
-                }});
-                if (!response.ok) throw new Error("HTTP " + response.status);
-                const data = await response.json();
-                const fileName = `${{extent.minx}}_${{extent.maxx}}_${{extent.miny}}_${{extent.maxy}}.json`;
-                const blob = new Blob([JSON.stringify(data, null, 2)], {{ type: "application/json" }});
-                const a = document.createElement("a");
-                a.href = URL.createObjectURL(blob);
-                a.download = fileName;
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                console.log("✅ Downloaded:", fileName);
-            }} catch (err) {{
-                console.error("❌ Error for extent", extent, err);
-            }}
+    const done = arguments[arguments.length - 1];
+    const qpsToken = "{qps_token}";
+    const jobs = {json.dumps(jobs)};
+    const requestDataTemplate = {json.dumps(REQUEST_TEMPLATE)};
+    const apiUrl = `{config.BEACON_API_URL}?QPS=${{qpsToken}}`;
+    const MAX_PARALLEL = {max_parallel};
+    const results = [];
+    let index = 0;
+    async function fetchExtent(job) {{
+        const requestData = {{ ...requestDataTemplate, ext: job.extent }};
+        const started = performance.now();
+        const result = {{ index: job.index, ok: false, status: null, bytes: 0, error: null }};
+        try {{
+            const response = await fetch(apiUrl, {{
+                method: "POST",
+                headers: {{
+                    "Content-Type": "application/json",
+                    "Accept": "text/plain, */*; q=0.01"
+                }},
+                body: JSON.stringify(requestData)
+            }});
+            result.status = response.status;
+            if (!response.ok) throw new Error("HTTP " + response.status);
+            const text = await response.text();
+            if (!text.trimStart().startsWith("{{")) throw new Error("response is not JSON");
+            const blob = new Blob([text], {{ type: "application/json" }});
+            const a = document.createElement("a");
+            a.href = URL.createObjectURL(blob);
+            a.download = job.fileName;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+            result.ok = true;
+            result.bytes = text.length;
+        }} catch (err) {{
+            result.error = String(err);
         }}
-        async function runBatch() {{
-            while (index < extents.length) {{
-                if (active < MAX_PARALLEL) {{
-                    const extent = extents[index++];
-                    active++;
-                    fetchExtent(extent).finally(() => active--);
-                }}
-                await delay(300);
-            }}
-            while (active > 0) await delay(500);
-            console.log("✅ Batch {batch_num} complete: Downloaded", extents.length, "extents");
-        }}
-        runBatch();
-    }})();
+        result.elapsed = (performance.now() - started) / 1000;
+        results.push(result);
+    }}
+    async function worker() {{
+        while (index < jobs.length) await fetchExtent(jobs[index++]);
+    }}
+    Promise.all(Array.from({{ length: MAX_PARALLEL }}, worker)).then(() => done(results));
     """
     print(f"🚀 Injecting batch #{batch_num} with {len(extents)} extents...")
-    driver.execute_script(js_code)
-
-
-def capture_qps_and_download():
-    importlib.reload(config)
-    layer_id = config.layer_id
-    layer_name = config.layer_name
-    FOLDER_NAME = config.FOLDER_NAME
+    driver.set_script_timeout(timeout)
+    started = time.time()
+    try:
+        results = driver.execute_async_script(js_code)
+    except TimeoutException:
+        print(f"⏱️ Batch {batch_num} did not finish within {timeout}s; marking its extents as failed.")
+        elapsed = time.time() - started
+        return [{"extent": extent, "ok": False, "status": None, "bytes": 0, "features": 0,
+                 "error": f"script timeout after {timeout}s", "elapsed": elapsed} for extent in extents]
+
+    # Numbers round-trip through JS (1000.0 comes back as 1000), so each result
+    # gets back the Python extent its file name and manifest id were built from.
+    for r in results:
+        r["extent"] = extents[r.pop("index")]
+    print(f"✅ Batch {batch_num}: {sum(r['ok'] for r in results)}/{len(results)} extents fetched.")
+    return results
+
+
+def wait_for_downloads(results, download_folder, timeout=120):
+    """
+    Waits until Chrome has written the file of every extent the batch
+    reported as fetched. Returns the file names still missing at the timeout.
+    """
+    expected = {extent_filename(r["extent"]) for r in results if r["ok"]}
+    deadline = time.time() + timeout
+    while expected and time.time() < deadline:
+        expected = {name for name in expected if not os.path.exists(os.path.join(download_folder, name))}
+        if expected:
+            time.sleep(0.2)
+    return expected
+
+
+def capture_qps_and_download(layer):
+    layer_id = layer.layer_id
+    layer_name = layer.layer_name
+    BEACON_URL = layer.run.beacon_url
     print(layer_name, layer_id)
 
-    DOWNLOAD_FOLDER = os.path.join(os.getcwd(), FOLDER_NAME, layer_name, "json")
+    DOWNLOAD_FOLDER = layer.json_folder
     os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
     REQUEST_TEMPLATE = {
@@ -197,21 +275,93 @@ def capture_qps_and_download():
         "wkt": None
     }
 
-    EXTENT_FILE = os.path.join(os.getcwd(), FOLDER_NAME, "finishnet.json")
+    EXTENT_FILE = layer.run.finishnet_path
     if not os.path.exists(EXTENT_FILE):
         raise FileNotFoundError(f"❌ Could not find extent file: {EXTENT_FILE}")
     with open(EXTENT_FILE, "r") as f:
         EXTENTS = json.load(f)
 
+    # Resume from the layer manifest: only extents not finished yet
+    manifest = open_manifest(layer)
+    manifest.add_extents(EXTENTS)
+    if manifest.is_new:
+        reconciled = manifest.reconcile_files(DOWNLOAD_FOLDER)
+        if reconciled:
+            print(f"📒 Imported {reconciled} previously downloaded extents into the manifest.")
+    if config.DOWNLOAD_REQUEUE_DEAD_LETTERS:
+        requeued = manifest.requeue_dead_letters(config.DOWNLOAD_MAX_ATTEMPTS)
+        if requeued:
+            print(f"📒 Re-queued {requeued} dead-lettered extents from an earlier run.")
+    EXTENTS = manifest.pending(config.DOWNLOAD_MAX_ATTEMPTS)
+    print(f"📒 {len(EXTENTS)} extents left to download.")
+
     batch_size = 250
     total_batches = (len(EXTENTS) + batch_size - 1) // batch_size
 
-    # Use a single browser instance for all batches
-    options = make_options(DOWNLOAD_FOLDER, headless=False)
-    service = Service(ChromeDriverManager().install())
-    driver = uc.Chrome(options=options, service=service)
-    driver.execute_cdp_cmd("Network.enable", {})
-
+    # Warm browser from the pool, taken on first use
+    driver = None
+
+    def browser():
+        nonlocal driver
+        if driver is None or not BROWSER_POOL.is_alive():
+            driver = BROWSER_POOL.acquire(DOWNLOAD_FOLDER)
+        return driver
+
+    def fetch_batch(entry, extents, batch_num):
+        if config.DOWNLOAD_MODE == "http":
+            # Browser only supplied the token and cookies; POST from Python.
+            session = make_session(entry["cookies"], entry["user_agent"], BEACON_URL,
+                                   config.DOWNLOAD_MAX_PARALLEL)
+            results = download_extents(session, config.BEACON_API_URL, entry["token"], extents,
+                                       REQUEST_TEMPLATE, DOWNLOAD_FOLDER, **download_window_options())
+            session.close()
+        else:
+            if not browser().current_url.startswith(BEACON_URL.split("/Application")[0]):
+                open_and_get_qps(driver, BEACON_URL)  # injected fetches must run on the Beacon origin
+            results = download_batch(driver, entry["token"], extents, batch_num, REQUEST_TEMPLATE)
+            not_written = wait_for_downloads(results, DOWNLOAD_FOLDER)
+            if not_written:
+                print(f"⚠️ {len(not_written)} fetched extents were not written to disk in time.")
+                for r in results:
+                    if extent_filename(r["extent"]) in not_written:
+                        r["ok"], r["error"] = False, "file not written"
+            for r in results:
+                if not r["ok"]:
+                    print(f"❌ Error for extent {extent_filename(r['extent'])}: {r['error']}")
+        entry["requests"] += len(results)
+        return results
+
+    def fetch_batch_with_token(entry, extents, batch_num):
+        results = fetch_batch(entry, extents, batch_num)
+
+        # Token rejected: harvest a fresh one and retry only the rejected extents
+        rejected = [r for r in results if r["status"] in AUTH_ERROR_STATUSES]
+        if rejected:
+            TOKEN_MANAGER.invalidate(entry, f"HTTP {rejected[0]['status']}")
+            entry = TOKEN_MANAGER.get(browser, BEACON_URL)
+            if entry:
+                roots = {extent_filename(r.get("root", r["extent"])): r.get("root", r["extent"]) for r in rejected}
+                retried = fetch_batch(entry, list(roots.values()), batch_num)
+                results = [r for r in results
+                           if extent_filename(r.get("root", r["extent"])) not in roots] + retried
+        return results
+
+    # Coarse pre-pass: only descend into cells whose parent has features
+    if config.DOWNLOAD_MODE == "http" and config.PREPASS_FACTOR > 1 and EXTENTS:
+        entry = TOKEN_MANAGER.get(browser, BEACON_URL)
+        if entry:
+            session = make_session(entry["cookies"], entry["user_agent"], BEACON_URL,
+                                   config.DOWNLOAD_MAX_PARALLEL)
+            EXTENTS, empty = skip_empty_extents(
+                session, config.BEACON_API_URL, entry["token"], EXTENTS, REQUEST_TEMPLATE,
+                config.PREPASS_FACTOR, os.path.join(layer.folder, "prepass.json"),
+                **download_window_options(),
+            )
+            session.close()
+            manifest.mark_empty(empty)
+            total_batches = (len(EXTENTS) + batch_size - 1) // batch_size
+
+    all_results = []
     for batch_num in range(total_batches):
         start = batch_num * batch_size
         end = min(start + batch_size, len(EXTENTS))
@@ -220,44 +370,52 @@ def capture_qps_and_download():
         print(f"\n========== 📦 Processing batch {batch_num+1}/{total_batches} "
               f"({len(batch_extents)} extents) ==========")
 
-        qps_token = open_and_get_qps(driver)
-        if not qps_token:
+        entry = TOKEN_MANAGER.get(browser, BEACON_URL)
+        if not entry:
             print(f"⚠️ Failed to get QPS token for batch {batch_num+1}, skipping.")
             continue
 
         qps_file = os.path.join(DOWNLOAD_FOLDER, f"qps_batch_{batch_num+1}.txt")
         with open(qps_file, "w") as f:
-            f.write(qps_token)
-
-        download_batch(driver, qps_token, batch_extents, batch_num + 1, REQUEST_TEMPLATE)
-
-        # Wait for downloads to stabilize
-        print("⏳ Waiting for downloads to finish...")
-        prev_count = 0
-        stable_rounds = 0
-        max_stable_rounds = 3
-        max_wait_time = 120
-        start_time = time.time()
-
-        while True:
-            files = [f for f in os.listdir(DOWNLOAD_FOLDER) if f.endswith(".json")]
-            curr_count = len(files)
-            if curr_count == prev_count:
-                stable_rounds += 1
-            else:
-                stable_rounds = 0
-                prev_count = curr_count
-            if stable_rounds >= max_stable_rounds:
-                print(f"✅ Downloads stabilized at {curr_count} files.")
-                break
-            if time.time() - start_time > max_wait_time:
-                print("⚠️ Timeout waiting for downloads — continuing anyway.")
+            f.write(entry["token"])
+
+        results = fetch_batch_with_token(entry, batch_extents, batch_num + 1)
+        manifest.record(results)
+        print(f"✅ Batch {batch_num+1} done ({sum(r['ok'] for r in results)}/{len(results)} extents downloaded).")
+        all_results.extend(results)
+
+    print(f"\n✅ All batches processed. Manifest: {manifest.counts()}")
+
+    # Retry failed extents in this session, each after its own exponential backoff
+    retry_round = 0
+    while True:
+        due, wait = manifest.retry_schedule(config.DOWNLOAD_MAX_ATTEMPTS, config.DOWNLOAD_RETRY_BACKOFF)
+        if not due:
+            if wait is None:
                 break
-            time.sleep(5)
+            time.sleep(wait)
+            continue
+
+        retry_round += 1
+        print(f"\n🔁 Retry round {retry_round}: {len(due)} failed extents...")
+        entry = TOKEN_MANAGER.get(browser, BEACON_URL)
+        if not entry:
+            print("⚠️ Failed to get QPS token for retries, giving up.")
+            break
+        results = fetch_batch_with_token(entry, due, total_batches + retry_round)
+        manifest.record(results)
+        all_results.extend(results)
+
+    dead_letters = manifest.dead_letters(config.DOWNLOAD_MAX_ATTEMPTS)
+    if dead_letters:
+        print(f"☠️ {len(dead_letters)} extents failed {config.DOWNLOAD_MAX_ATTEMPTS} times and were given up:")
+        for extent_id, attempts, error in dead_letters[:20]:
+            print(f"    {extent_id} ({attempts} attempts): {error}")
 
-        print(f"✅ Batch {batch_num+1} done ({curr_count} files total).")
-    print("\n✅ All batches processed.")
+    manifest.close()
+    return all_results
 
 
 if __name__ == "__main__":
-    capture_qps_and_download()
+    from run_context import default_layer_context
+    capture_qps_and_download(default_layer_context())
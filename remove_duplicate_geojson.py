@@ -1,30 +1,81 @@
 import os
 import json
-from config import FOLDER_NAME
+import hashlib
+import ijson
 import config
-import importlib
+from geojson import write_feature_collection
 
-def remove_duplicate():
+
+def round_coordinates(coordinates, precision):
+    """Rounds a (nested) GeoJSON coordinate array."""
+    if isinstance(coordinates, (list, tuple)):
+        return [round_coordinates(c, precision) for c in coordinates]
+    if isinstance(coordinates, float):
+        return round(coordinates, precision)
+    return coordinates
+
+
+def geometry_key(geometry, precision=None):
+    """
+    Fixed-size key of a geometry: blake2b (16 bytes) of its canonical JSON
+    (sorted keys, no whitespace). With a precision, coordinates are rounded
+    to that many decimals first, so near-identical copies collapse too.
+    """
+    if precision is not None:
+        geometry = dict(geometry)
+        if "coordinates" in geometry:
+            geometry["coordinates"] = round_coordinates(geometry["coordinates"], precision)
+        if "geometries" in geometry:
+            geometry["geometries"] = [
+                {**g, "coordinates": round_coordinates(g.get("coordinates"), precision)}
+                for g in geometry["geometries"]
+            ]
+    canonical = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+def read_collection_header(path):
     """
-    Removes duplicate geometries from the GeoJSON file and saves
+    Top-level members that precede "features" (type, metadata), read
+    without touching the features. Returns (members, has_features).
+    """
+    members = {}
+    with open(path, "rb") as f:
+        events = ijson.parse(f, use_float=True)
+        for prefix, event, value in events:
+            if prefix != "" or event != "map_key":
+                continue
+            if value == "features":
+                return members, True
+
+            builder = ijson.ObjectBuilder()
+            depth = 0
+            for _, member_event, member_value in events:
+                builder.event(member_event, member_value)
+                if member_event in ("start_map", "start_array"):
+                    depth += 1
+                elif member_event in ("end_map", "end_array"):
+                    depth -= 1
+                if depth == 0:
+                    break
+            members[value] = builder.value
+    return members, False
+
+
+def remove_duplicate(layer, precision=None):
+    """
+    Removes duplicate geometries from the layer's GeoJSON file and saves
     the cleaned version into a subfolder called 'remove_duplicate_geojson'.
+    Features are parsed and written one at a time; only a 16-byte hash per
+    unique geometry is kept in memory.
     """
-    importlib.reload(config)  # reload config to get updated values
-    layer_name = config.layer_name
-    TABLE_NAME = config.TABLE_NAME
-    FOLDER_NAME = config.FOLDER_NAME
-    safe_layer_name = layer_name.replace(" ", "_").lower()
-
-    # Final table name: TABLE_NAME + '_' + safe_layer_name
-    table_name = f"{TABLE_NAME}_{safe_layer_name}"
-
-    # Create output folder inside your project folder
-    output_folder = os.path.join(FOLDER_NAME, layer_name, "remove_duplicate_geojson")
-    os.makedirs(output_folder, exist_ok=True)
+    if precision is None:
+        precision = config.GEOJSON_DEDUP_PRECISION
 
     # Define input and output paths
-    input_file_path = os.path.join(FOLDER_NAME,layer_name, "geojson", f"{table_name}.geojson")
-    output_file_path = os.path.join(output_folder, f"{table_name}.geojson")
+    input_file_path = layer.geojson_path
+    output_file_path = layer.dedup_geojson_path
+    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
 
     # Validate input file existence
     if not os.path.exists(input_file_path):
@@ -37,10 +88,8 @@ def remove_duplicate():
         return
 
     try:
-        # Use standard json library to load GeoJSON
-        with open(input_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
+        header, has_features = read_collection_header(input_file_path)
+    except ijson.JSONError as e:
         print(f"❌ Failed to decode JSON file: {input_file_path}")
         print(f"   Error: {e}")
         return
@@ -49,49 +98,54 @@ def remove_duplicate():
         return
 
     # Ensure it’s a valid FeatureCollection
-    if "type" not in data or data["type"] != "FeatureCollection":
+    if header.get("type") != "FeatureCollection":
         print(f"❌ Invalid GeoJSON: Expected a FeatureCollection.")
         return
 
-    if "features" not in data or not isinstance(data["features"], list):
+    if not has_features:
         print("❌ Invalid GeoJSON: Missing or invalid 'features' key.")
         return
 
-    # Track unique geometries
+    # Track unique geometries by hash
     unique_geometries = set()
-    unique_features = []
-
-    for feature in data["features"]:
-        try:
-            # Ensure feature has a geometry
-            if "geometry" not in feature or not feature["geometry"]:
-                print(f"⚠️ Skipping feature with missing geometry: {feature}")
+    stats = {"total": 0}
+
+    def unique_features(features):
+        for feature in features:
+            stats["total"] += 1
+            try:
+                # Ensure feature has a geometry
+                if "geometry" not in feature or not feature["geometry"]:
+                    print(f"⚠️ Skipping feature with missing geometry: {feature}")
+                    continue
+
+                key = geometry_key(feature["geometry"], precision)
+
+                if key not in unique_geometries:
+                    unique_geometries.add(key)
+                    yield feature
+            except (KeyError, TypeError) as e:
+                print(f"⚠️ Skipping feature due to missing data: {e}")
                 continue
 
-            key = json.dumps(feature["geometry"], sort_keys=True)
-
-            if key not in unique_geometries:
-                unique_geometries.add(key)
-                unique_features.append(feature)
-        except KeyError as e:
-            print(f"⚠️ Skipping feature due to missing data: {e}")
-            continue
-
-    # Create a new GeoJSON FeatureCollection
-    unique_geojson = {
-        "type": "FeatureCollection",
-        "features": unique_features
-    }
-
-    # Write the cleaned GeoJSON file
+    # Write the cleaned GeoJSON file as features stream in (temp name until complete)
     try:
-        with open(output_file_path, "w", encoding="utf-8") as f:
-            json.dump(unique_geojson, f, indent=2)
+        with open(input_file_path, "rb") as source, \
+                open(output_file_path + ".part", "w", encoding="utf-8") as f:
+            features = ijson.items(source, "features.item", use_float=True)
+            total_unique = write_feature_collection(
+                f, unique_features(features), config.GEOJSON_COMPACT, header.get("metadata"),
+            )
+        os.replace(output_file_path + ".part", output_file_path)
+    except ijson.JSONError as e:
+        print(f"❌ Failed to decode JSON file: {input_file_path}")
+        print(f"   Error: {e}")
+        return
     except IOError as e:
         print(f"❌ Failed to write output file: {output_file_path}")
         print(f"   Error: {e}")
         return
 
-    total_unique = len(unique_features)
     print(f"    ✅ Removed duplicates. Saved to: {output_file_path}")
-    print(f"    📊 Total unique features: {total_unique}\n")
\ No newline at end of file
+    print(f"    📊 Total unique features: {total_unique} "
+          f"({stats['total'] - total_unique} duplicates or empty geometries dropped)\n")
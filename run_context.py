@@ -0,0 +1,82 @@
+import os
+from dataclasses import dataclass, field
+from urllib.parse import urlparse, parse_qs
+import config
+
+
+def safe_name(name):
+    """Folder / table name form of a county or layer name: "Cass County IL" -> "cass_county_il"."""
+    return name.replace(" ", "_").lower()
+
+
+@dataclass
+class RunContext:
+    """
+    Everything a stage needs to know about the county being processed.
+    It is built once per county and passed explicitly to every stage, so
+    nothing is written back to config.py and parallel counties share no state.
+    """
+    beacon_url: str
+    county_name: str
+    base_dir: str = field(default_factory=os.getcwd)
+    srid: int = None  # filled in by extract_srid_and_layers
+
+    @property
+    def app_id(self):
+        return parse_qs(urlparse(self.beacon_url).query).get("AppID", [self.beacon_url])[0]
+
+    @property
+    def table_name(self):
+        return safe_name(self.county_name)  # cass_county_il
+
+    @property
+    def folder(self):
+        return os.path.join(self.base_dir, safe_name(self.county_name))
+
+    @property
+    def finishnet_path(self):
+        return os.path.join(self.folder, "finishnet.json")
+
+    def layer(self, layer_id, layer_name):
+        return LayerContext(self, layer_id, safe_name(layer_name))
+
+
+@dataclass
+class LayerContext:
+    """One zoning layer of a county: its id, name and the paths and table derived from them."""
+    run: RunContext
+    layer_id: int
+    layer_name: str
+
+    @property
+    def table_name(self):
+        return f"{self.run.table_name}_{self.layer_name}"
+
+    @property
+    def folder(self):
+        return os.path.join(self.run.folder, self.layer_name)
+
+    @property
+    def json_folder(self):
+        return os.path.join(self.folder, "json")
+
+    @property
+    def geojson_path(self):
+        return os.path.join(self.folder, "geojson", f"{self.table_name}.geojson")
+
+    @property
+    def dedup_geojson_path(self):
+        return os.path.join(self.folder, "remove_duplicate_geojson", f"{self.table_name}.geojson")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.folder, "manifest.sqlite")
+
+
+def default_run_context():
+    """Context from the defaults in config.py, for running a single stage module by hand."""
+    return RunContext(config.BEACON_URL, config.COUNTY_NAME)
+
+
+def default_layer_context():
+    return default_run_context().layer(config.layer_id, config.layer_name)
@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+
+# Limits shared by all county workers of one run (see county_scheduler).
+# They stay None in a plain single-county run, which makes every helper a no-op.
+_browser_slots = None
+_db_slots = None
+_next_request = None   # multiprocessing.Value("d"): earliest start time of the next request
+_request_interval = 0.0
+
+
+def install(browser_slots=None, db_slots=None, next_request=None, max_rps=None):
+    """Called once per worker process with the semaphores / shared clock of the run."""
+    global _browser_slots, _db_slots, _next_request, _request_interval
+    _browser_slots = browser_slots
+    _db_slots = db_slots
+    _next_request = next_request if max_rps else None
+    _request_interval = 1.0 / max_rps if max_rps else 0.0
+
+
+def acquire_browser():
+    """Blocks until this process may start a Chrome instance."""
+    if _browser_slots is not None:
+        _browser_slots.acquire()
+
+
+def release_browser():
+    if _browser_slots is not None:
+        _browser_slots.release()
+
+
+@contextmanager
+def db_slot():
+    """Holds one of the run's database slots for the duration of a DB-heavy stage."""
+    if _db_slots is None:
+        yield
+        return
+    _db_slots.acquire()
+    try:
+        yield
+    finally:
+        _db_slots.release()
+
+
+def throttle_request():
+    """Waits for this request's turn under the run-wide requests-per-second ceiling."""
+    if _next_request is None:
+        return
+    with _next_request.get_lock():
+        now = time.time()
+        start = max(now, _next_request.value)
+        _next_request.value = start + _request_interval
+    if start > now:
+        time.sleep(start - now)
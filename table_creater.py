@@ -4,31 +4,26 @@ import os
 import requests
 import psycopg2
 import json
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from config import DB_CONFIG
 import config
-import importlib
+from psycopg2.extras import execute_values
+from browser_pool import BROWSER_POOL
+from grid_planner import (
+    choose_step, step_for_max_features, cell_count, generate_extents, project_bbox,
+    load_county_boundary, clip_extents,
+)
 
 
 # ============= STEP 1: Extract SRID =============
-def extract_srid_and_layers():
-    importlib.reload(config)
-    BEACON_URL = config.BEACON_URL
-    FOLDER_NAME = config.FOLDER_NAME
-
-    opts = Options()
-    # opts.add_argument("--headless")  # Run without opening a window
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=opts)
+def extract_srid_and_layers(run):
+    """Reads the SRID and the zoning layers of the county's Beacon app; also stores the SRID on `run`."""
+    BEACON_URL = run.beacon_url
+    FOLDER_NAME = run.folder
+
+    driver = BROWSER_POOL.acquire()
 
     driver.get(BEACON_URL)
     print("	🧩 Getting SRID")
@@ -65,8 +60,6 @@ def extract_srid_and_layers():
         if "zoning" in name.lower()
     ]
 
-    driver.quit()
-
     # Save zoning layers
     if zoning_layers:
         print("		✅ Found zoning layers:")
@@ -80,6 +73,7 @@ def extract_srid_and_layers():
     else:
         print("		⚠️ No zoning layers found.")
 
+    run.srid = srid
     return srid, zoning_layers
 
 
@@ -100,9 +94,8 @@ def extract_srid_and_layers():
 #     print(f"		✅ Bounding Box: South={south}, North={north}, West={west}, East={east}")
 #     return south, north, west, east
 
-def get_bounding_box():
-    importlib.reload(config)
-    COUNTY_NAME = config.COUNTY_NAME
+def get_bounding_box(run):
+    COUNTY_NAME = run.county_name
 
 
     print(f"\n	🌍 Fetching bounding box for: {COUNTY_NAME} (Google Geocode API)")
@@ -143,11 +136,58 @@ def get_bounding_box():
     print(f"		✅ Bounding Box: South={south}, North={north}, West={west}, East={east}")
     return south, north, west, east
 
-# ============= STEP 3: Create Table and Grid =============
-def create_table_and_grid(srid, south, north, west, east):
-    importlib.reload(config)  # <-- reload config to get updated values
-    TABLE_NAME = config.TABLE_NAME
-    print("\n    🗺️ Creating table and inserting grid...")
+# ============= STEP 3: Create Grid =============
+def create_table_and_grid(run, south, north, west, east):
+    """
+    Builds the finishnet extents in-process: the bbox is projected locally
+    to the county's SRID with pyproj and the grid is generated in Python.
+    Saving the grid to a PostGIS table is an optional side output
+    (config.SAVE_GRID_TABLE). Returns the list of extents.
+    """
+    srid = run.srid
+    print("\n    🗺️ Creating grid...")
+
+    # Compute projected extent
+    xmin, xmax, ymin, ymax = project_bbox(srid, south, north, west, east)
+    print(f"		✅ Projected Extent: xmin={xmin}, xmax={xmax}, ymin={ymin}, ymax={ymax}")
+
+    # --- AUTO-DETERMINE GRID STEP SIZE ---
+    width, height = xmax - xmin, ymax - ymin
+    if config.GRID_MAX_FEATURES_PER_CELL and config.GRID_EXPECTED_FEATURES:
+        print(f"	🔍 Finding grid size for <= {config.GRID_MAX_FEATURES_PER_CELL} features per cell...")
+        best_step = step_for_max_features(width, height, config.GRID_EXPECTED_FEATURES,
+                                          config.GRID_MAX_FEATURES_PER_CELL)
+    else:
+        print(f"	🔍 Finding grid size that produces ~{config.GRID_TARGET_CELLS} cells...")
+        best_step = choose_step(width, height, config.GRID_TARGET_CELLS)
+
+    print(f"		✅ Selected grid size: {best_step} ({cell_count(width, height, best_step)} cells)")
+
+    extents = generate_extents(xmin, ymin, xmax, ymax, best_step)
+    print(f"	    ✅ Generated {len(extents)} grid cells.")
+
+    # Drop cells outside the county outline (neighbouring counties, lakes, bbox corners)
+    if config.COUNTY_BOUNDARY_FILE:
+        boundary = load_county_boundary(config.COUNTY_BOUNDARY_FILE, run.county_name,
+                                        config.COUNTY_BOUNDARY_NAME_FIELD)
+        if boundary is None:
+            print(f"		⚠️ '{run.county_name}' not found in {config.COUNTY_BOUNDARY_FILE}, keeping the full grid.")
+        else:
+            total = len(extents)
+            extents = clip_extents(extents, boundary, srid)
+            print(f"		✂️ Clipped to county boundary: {len(extents)}/{total} cells kept "
+                  f"({1 - len(extents) / total:.0%} fewer requests).")
+
+    if config.SAVE_GRID_TABLE:
+        save_grid_table(run, extents)
+    return extents
+
+
+def save_grid_table(run, extents):
+    """Optional side output: the grid as a PostGIS table named after the county."""
+    srid = run.srid
+    TABLE_NAME = run.table_name
+    print("\n    🗺️ Saving grid table...")
 
     conn = psycopg2.connect(**DB_CONFIG)
     cur = conn.cursor()
@@ -166,132 +206,33 @@ def create_table_and_grid(srid, south, north, west, east):
     """)
     print(f"		✅ Table '{TABLE_NAME}' created with SRID {srid}.")
 
-    # Compute projected extent
-    cur.execute(f"""
-        SELECT
-            ST_XMin(geom), ST_XMax(geom),
-            ST_YMin(geom), ST_YMax(geom)
-        FROM (
-            SELECT ST_Transform(
-                ST_MakeEnvelope({west}, {south}, {east}, {north}, 4326),
-                {srid}
-            ) AS geom
-        ) AS subquery;
-    """)
-    xmin, xmax, ymin, ymax = cur.fetchone()
-    print(f"		✅ Projected Extent: xmin={xmin}, xmax={xmax}, ymin={ymin}, ymax={ymax}")
-
-    # --- AUTO-DETERMINE GRID STEP SIZE ---
-    print("	🔍 Finding grid size that produces ~3000 cells...")
-
-    target_count = 3000
-    best_step = None
-    best_diff = float("inf")
-
-    for step in range(500, 4501, 100):  # try 1500, 1600, ... 3500
-        cur.execute(f"""
-                WITH grid AS (
-                    SELECT
-                        x_series AS x_min,
-                        y_series AS y_min,
-                        x_series + {step} AS x_max,
-                        y_series + {step} AS y_max
-                    FROM
-                        generate_series({xmin}, {xmax}, {step}) AS x_series,
-                        generate_series({ymin}, {ymax}, {step}) AS y_series
-                )
-                SELECT COUNT(*) FROM grid;
-            """)
-        count = cur.fetchone()[0]
-        diff = abs(count - target_count)
-
-        print(f"			step={step} → count={count}")
-
-        if diff < best_diff:
-            best_diff = diff
-            best_step = step
-
-        if count == target_count:
-            break
-
-    print(f"		✅ Selected grid size: {best_step} (closest to 3000 cells)")
-
-    # --- INSERT FINAL GRID USING SELECTED STEP ---
-    cur.execute(f"""
-            WITH grid AS (
-                SELECT
-                    x_series AS x_min,
-                    y_series AS y_min,
-                    x_series + {best_step} AS x_max,
-                    y_series + {best_step} AS y_max
-                FROM
-                    generate_series({xmin}, {xmax}, {best_step}) AS x_series,
-                    generate_series({ymin}, {ymax}, {best_step}) AS y_series
-            )
-            INSERT INTO {TABLE_NAME} (geom)
-            SELECT ST_MakeEnvelope(x_min, y_min, x_max, y_max, {srid})
-            FROM grid;
-        """)
-    print("		✅ Grid polygons inserted successfully.")
-
-    # Update bbox columns
-    cur.execute(f"""
-        UPDATE {TABLE_NAME}
-        SET
-            x_min = ST_XMin(geom),
-            x_max = ST_XMax(geom),
-            y_min = ST_YMin(geom),
-            y_max = ST_YMax(geom);
-    """)
-    print("		✅ Bounding box fields updated for each grid cell.")
-
-    # Verify count
-    cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME};")
-    count = cur.fetchone()[0]
+    execute_values(
+        cur,
+        f"INSERT INTO {TABLE_NAME} (x_min, y_min, x_max, y_max, geom) VALUES %s;",
+        extents,
+        template=(
+            "(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, "
+            f"ST_MakeEnvelope(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, {srid}))"
+        ),
+        page_size=1000,
+    )
 
     conn.commit()
     cur.close()
     conn.close()
-    print(f"	    ✅ Inserted {count} grid polygons.")
+    print(f"	    ✅ Inserted {len(extents)} grid polygons.")
 
 # ============= STEP 4: Export Grid to JSON =============
-def export_grid_to_json():
-    importlib.reload(config)  # <-- reload config to get updated values
-    TABLE_NAME = config.TABLE_NAME
-    FOLDER_NAME = config.FOLDER_NAME
+def export_grid_to_json(run, extents):
     print("\n🚀 ======  Exporting grid data to JSON ====== ")
-
-    conn = psycopg2.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    cursor.execute(f"SELECT x_min, y_min, x_max, y_max FROM {TABLE_NAME};")
-    records = cursor.fetchall()
-
-    record_array = []
-    for record in records:
-        x_min, y_min, x_max, y_max = record
-        record_dict = {
-            "minx": x_min,
-            "miny": y_min,
-            "maxx": x_max,
-            "maxy": y_max
-        }
-        record_array.append(record_dict)
-
-    json_output = json.dumps(record_array, indent=2)
-
-    print(f"	 ✅ Total number of records: {len(record_array)}")
+    print(f"	 ✅ Total number of records: {len(extents)}")
 
     # Create directory for the table name
-    output_dir = os.path.join(os.getcwd(), FOLDER_NAME)
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(run.folder, exist_ok=True)
 
     # Save JSON file as 'finishnet.json' inside the folder
-    filename = os.path.join(output_dir, "finishnet.json")
+    filename = run.finishnet_path
     with open(filename, "w") as outfile:
-        outfile.write(json_output)
+        json.dump(extents, outfile)
 
     print(f"     💾 JSON file saved as: {filename}")
-
-    cursor.close()
-    conn.close()
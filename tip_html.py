@@ -0,0 +1,409 @@
+import re
+import html
+from functools import lru_cache
+from bs4 import BeautifulSoup
+
+
+# ========================================
+#  Helpers
+# ========================================
+def sanitize_key(key):
+    """
+    Function to sanitize column names to comply with SQL naming conventions.
+    - Replace invalid characters with underscores.
+    - Prefix column names that start with numbers with 'col_'.
+    """
+    key = re.sub(r'\W+', '_', key)  # Replace non-alphanumeric characters with underscores
+    if key[0].isdigit():  # If the key starts with a digit, prefix it with 'col_'
+        key = f"col_{key}"
+    return key.lower()
+
+
+# <div>Zoning: <b>I-1</b></div><div><a href="https://...">View I-1 Ordinance</a></div>
+ZONING_LINK_PATTERN = re.compile(
+    r'\s*<div>\s*Zoning:\s*<b>([^<&]*)</b>\s*</div>'
+    r'\s*<div>\s*<a href="([^"&]*)"(?:\s+[\w-]+="[^"]*")*\s*>[^<]*</a>\s*</div>\s*'
+)
+# Only the tags the fast path understands; anything else goes to BeautifulSoup.
+TOKEN_PATTERN = re.compile(r"<(/?)(div|b|br)\s*(/?)>|[^<]+")
+# Zoning layers repeat a few dozen TipHtml strings across thousands of polygons.
+TIP_HTML_CACHE_SIZE = 4096
+
+
+# ========================================
+#  Fast Path
+# ========================================
+def tokenize_tip_html(tip_html):
+    """
+    Turns TipHtml into a flat list of nodes:
+        ("text", str), ("br", None), ("b", str), ("div", [children])
+    Returns None when the markup uses anything beyond plain <div>, <b> and <br>
+    (attributes, entities, nesting), so the caller can fall back to BeautifulSoup.
+    """
+    if "&" in tip_html:
+        return None
+
+    nodes = []
+    div_children = None  # children of the currently open <div>
+    pos = 0
+    while pos < len(tip_html):
+        match = TOKEN_PATTERN.match(tip_html, pos)
+        if not match:
+            return None
+        closing, tag, self_closing = match.group(1), match.group(2), match.group(3)
+        target = nodes if div_children is None else div_children
+
+        if tag is None:
+            target.append(("text", match.group(0)))
+            pos = match.end()
+            continue
+
+        pos = match.end()
+        if tag == "br":
+            if closing:
+                return None
+            target.append(("br", None))
+        elif self_closing:
+            return None
+        elif tag == "div":
+            if closing == "" and div_children is None:
+                div_children = []
+            elif closing and div_children is not None:
+                nodes.append(("div", div_children))
+                div_children = None
+            else:
+                return None
+        else:
+            # <b>text</b> with a single non-empty text node inside
+            if closing:
+                return None
+            inner = TOKEN_PATTERN.match(tip_html, pos)
+            if not inner or inner.group(2) is not None:
+                return None
+            end = TOKEN_PATTERN.match(tip_html, inner.end())
+            if not end or end.group(2) != "b" or end.group(1) != "/" or end.group(3):
+                return None
+            target.append(("b", inner.group(0)))
+            pos = end.end()
+
+    if div_children is not None:
+        return None
+    return nodes
+
+
+def stripped_strings(nodes):
+    """Same strings (and order) as BeautifulSoup's stripped_strings."""
+    strings = []
+    for kind, value in nodes:
+        if kind == "div":
+            strings.extend(stripped_strings(value))
+        elif kind in ("text", "b") and value.strip():
+            strings.append(value.strip())
+    return strings
+
+
+def b_tag_key(text):
+    """Column name for a <b>Label:</b>, or None if BeautifulSoup would fail on it."""
+    key = text.strip().replace(":", "").replace(" ", "_")
+    return sanitize_key(key) if key else None
+
+
+def split_key_value(line, separator):
+    """Splits 'Label: Value', or returns None if the label is empty."""
+    key, value = line.split(separator, 1)
+    key = key.strip().replace(" ", "_")
+    if not key:
+        return None
+    return sanitize_key(key), value.strip()
+
+
+def parse_tip_html_fast(tip_html):
+    """
+    Extracts columns from the common TipHtml shapes without building a soup.
+    Mirrors parse_tip_html_with_soup branch by branch and returns None for
+    anything it does not recognize.
+    """
+    dynamic_columns = {}
+
+    if "<" not in tip_html or ">" not in tip_html:
+        # Plain text: key=value lines
+        for line in tip_html.splitlines():
+            if "=" in line:
+                key, value = line.split("=", 1)
+                key = key.strip().replace(" ", "_")
+                if not key:
+                    return None
+                dynamic_columns[sanitize_key(key)] = value.strip()
+        return dynamic_columns
+
+    if 'Zoning:' in tip_html and '<b>' in tip_html and '<a href' in tip_html:
+        # <div>Zoning: <b>I-1</b></div><div><a href="...">...</a></div>
+        match = ZONING_LINK_PATTERN.fullmatch(tip_html)
+        if not match:
+            return None
+        zoning_value, link = match.group(1).strip(), match.group(2).strip()
+        if zoning_value:
+            dynamic_columns["zoning"] = zoning_value
+        if link:
+            dynamic_columns["ordinance_link"] = link
+        return dynamic_columns
+
+    nodes = tokenize_tip_html(tip_html)
+    if nodes is None:
+        return None
+
+    if (
+            tip_html.strip().startswith("<div>")
+            and "</div>" in tip_html
+            and ":" not in tip_html
+            and "<b>" not in tip_html
+            and "<a" not in tip_html
+    ):
+        # <div>C1</div>
+        value = "".join(stripped_strings(nodes))
+        if " " not in value:
+            if value:
+                dynamic_columns["tip_value"] = value
+            return dynamic_columns
+
+    divs = [children for kind, children in nodes if kind == "div"]
+    if divs:
+        for children in divs:
+            b_positions = [i for i, (kind, _) in enumerate(children) if kind == "b"]
+            if b_positions:
+                # <div><b>Label:</b> value<br><b>Other:</b> value</div>
+                for i in b_positions:
+                    key = b_tag_key(children[i][1])
+                    if key is None:
+                        return None
+                    value_parts = []
+                    for kind, text in children[i + 1:]:
+                        if kind == "b":
+                            break
+                        if kind == "text" and text.strip():
+                            value_parts.append(text.strip())
+                    value = " ".join(value_parts).replace("\xa0", "").strip()
+                    if value:
+                        dynamic_columns[key] = value
+                continue
+
+            # <div>Label: Value</div>
+            strings = stripped_strings(children)
+            text = " ".join(strings)
+            separator = ":" if ":" in text else "=" if "=" in text else None
+            if separator:
+                pair = split_key_value(text, separator)
+                if pair is None:
+                    return None
+                if pair[1]:
+                    dynamic_columns[pair[0]] = pair[1]
+            plain_text = "".join(strings)
+            if plain_text:
+                dynamic_columns["tip_value"] = plain_text
+        return dynamic_columns
+
+    if any(kind == "b" for kind, _ in nodes):
+        # <b>Label</b>value<br>
+        for i, (kind, text) in enumerate(nodes):
+            if kind != "b":
+                continue
+            key = b_tag_key(text)
+            if key is None:
+                return None
+            if i + 1 == len(nodes):
+                continue
+            next_kind, value = nodes[i + 1]
+            if next_kind != "text":
+                return None
+            value = value.strip().replace("\xa0", "").replace("\n", "")
+            if value:
+                dynamic_columns[key] = value
+        return dynamic_columns
+
+    # key=value lines separated by <br>
+    for line in stripped_strings(nodes):
+        separator = "=" if "=" in line else ":" if ":" in line else None
+        if not separator:
+            continue
+        pair = split_key_value(line, separator)
+        if pair is None:
+            return None
+        if pair[1]:
+            dynamic_columns[pair[0]] = pair[1]
+    return dynamic_columns
+
+
+# ========================================
+#  BeautifulSoup Fallback
+# ========================================
+def parse_tip_html_with_soup(tip_html):
+    """Original BeautifulSoup extraction, used for shapes the fast path skips."""
+    dynamic_columns = {}
+
+    # ======================
+    # 🆕 NEW CASES (before main logic)
+    # ======================
+    if (
+            'Zoning:' in tip_html
+            and '<b>' in tip_html
+            and '<a href' in tip_html
+    ):
+        # Example:
+        # <div>Zoning: <b>I-1</b></div>
+        # <div><a href="https://...">View I-1 Ordinance</a></div>
+        soup = BeautifulSoup(tip_html, "html.parser")
+        zoning_div = soup.find("div")
+        link_div = zoning_div.find_next_sibling("div") if zoning_div else None
+
+        # Extract zoning value
+        if zoning_div and zoning_div.find("b"):
+            zoning_value = zoning_div.find("b").get_text(strip=True)
+            if zoning_value:
+                dynamic_columns["zoning"] = zoning_value
+
+        # Extract ordinance link
+        if link_div and link_div.find("a") and link_div.find("a").get("href"):
+            dynamic_columns["ordinance_link"] = link_div.find("a")["href"].strip()
+
+    elif (
+            tip_html.strip().startswith("<div>")
+            and "</div>" in tip_html
+            and " " not in BeautifulSoup(tip_html, "html.parser").get_text(strip=True)
+            and ":" not in tip_html
+            and "<b>" not in tip_html
+            and "<a" not in tip_html
+    ):
+        # Example: <div>C1</div>
+        soup = BeautifulSoup(tip_html, "html.parser")
+        value = soup.get_text(strip=True)
+        if value:
+            dynamic_columns["tip_value"] = value
+
+    elif  "<" in tip_html and ">" in tip_html:
+        soup = BeautifulSoup(tip_html, "html.parser")
+        divs = soup.find_all("div")
+
+        # ======================
+        # Case 1: Handle <div> blocks
+        # ======================
+        if divs:
+            for div in divs:
+                # Loop through all <b> tags inside the div
+                b_tags = div.find_all("b")
+                if b_tags:
+                    for b_tag in b_tags:
+                        key = sanitize_key(
+                            b_tag.get_text(strip=True).replace(":", "").replace(" ", "_"))
+
+                        # Extract everything after this <b> until the next <b> or <br>
+                        value_parts = []
+                        for sibling in b_tag.next_siblings:
+                            if getattr(sibling, "name", None) == "b":  # stop if next <b> starts
+                                break
+                            if getattr(sibling, "name", None) == "br":
+                                continue
+                            text = str(sibling).strip()
+                            if text:
+                                value_parts.append(html.unescape(text))
+                        value = " ".join(value_parts).replace("\xa0", "").strip()
+                        if value:
+                            dynamic_columns[key] = value
+                    continue
+
+                # Case 2: "Label: Value" (plain text inside div)
+                text = div.get_text(" ", strip=True)
+                separator = ":" if ":" in text else "=" if "=" in text else None
+                if separator:
+                    parts = text.split(separator, 1)
+                    key = sanitize_key(parts[0].strip().replace(" ", "_"))
+                    value = parts[1].strip()
+
+                    # Extract link if present
+                    a_tag = div.find("a")
+                    if a_tag and a_tag.get("href"):
+                        value = a_tag["href"].strip()
+
+                    if value:
+                        dynamic_columns[key] = value
+
+                plain_text = div.get_text(strip=True)
+                if plain_text:
+                    dynamic_columns["tip_value"] = plain_text
+
+        # ======================
+        # Case 3: Standalone <b> tags outside <div>
+        # ======================
+        elif soup.find("b"):
+            for b_tag in soup.find_all("b"):
+                key = sanitize_key(b_tag.get_text(strip=True).replace(":", "").replace(" ", "_"))
+                value = b_tag.next_sibling
+                if value:
+                    value = html.unescape(str(value)).strip().replace("\xa0", "").replace("\n", "")
+                    if value:
+                        dynamic_columns[key] = value
+
+        # ======================
+        # Case 4: Plain text with <br> separators (no <div> or <b>)
+        # ======================
+        else:
+            text_parts = []
+            for elem in soup.stripped_strings:
+                text_parts.append(elem)
+
+            for line in text_parts:
+                # Look for key-value pairs separated by ':' or '='
+                separator = "=" if "=" in line else ":" if ":" in line else None
+                if not separator:
+                    continue
+
+                parts = line.split(separator, 1)
+                key = sanitize_key(parts[0].strip().replace(" ", "_"))
+                value = parts[1].strip()
+
+                # Handle links (like "View: <a href=...>")
+                a_tag = soup.find("a")
+                if a_tag and key.startswith("view") and a_tag.get("href"):
+                    value = a_tag["href"].strip()
+
+                if value:
+                    dynamic_columns[key] = value
+
+    else:
+        # ======================
+        # Fallback for plain text TipHtml
+        # ======================
+        for line in tip_html.splitlines():
+            if "=" in line:
+                key, value = line.split("=", 1)
+                key = sanitize_key(key.strip().replace(" ", "_"))
+                value = value.strip()
+                dynamic_columns[key] = value
+
+    return dynamic_columns
+
+
+# ========================================
+#  Entry Point
+# ========================================
+@lru_cache(maxsize=TIP_HTML_CACHE_SIZE)
+def parse_tip_html_cached(tip_html):
+    """Memoized parse keyed on the raw TipHtml string. Do not mutate the result."""
+    dynamic_columns = parse_tip_html_fast(tip_html)
+    if dynamic_columns is None:
+        dynamic_columns = parse_tip_html_with_soup(tip_html)
+    return dynamic_columns
+
+
+def parse_tip_html(tip_html):
+    """Returns the dynamic_columns dict for one feature's TipHtml."""
+    return dict(parse_tip_html_cached(tip_html))
+
+
+def tip_html_cache_stats():
+    """(hits, misses) of the TipHtml cache since the last reset."""
+    info = parse_tip_html_cached.cache_info()
+    return info.hits, info.misses
+
+
+def reset_tip_html_cache():
+    parse_tip_html_cached.cache_clear()